@@ -0,0 +1 @@
+"""Offline benchmark suite for EvoPrompt (see ``python -m benchmarks.run --help``)."""
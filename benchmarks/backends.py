@@ -0,0 +1,109 @@
+"""Latency-modelled mock backends for the benchmark suite."""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+import asyncio
+import json
+import random
+
+import httpx
+
+from evo_prompt.clients import ModelClient
+
+
+class LatencyModel:
+    """Samples request latency in seconds.
+
+    ``dist`` is ``"constant"`` (``mean``), ``"uniform"`` (``mean`` +/- ``spread``)
+    or ``"lognormal"`` (median ``mean``, shape ``sigma``), which reproduces the
+    long tail seen on real endpoints.
+    """
+
+    def __init__(self, dist: str = "lognormal", mean: float = 0.05, spread: float = 0.02, sigma: float = 0.5, seed: int | None = 0) -> None:
+        if dist not in ("constant", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {dist}")
+        self.dist = dist
+        self.mean = mean
+        self.spread = spread
+        self.sigma = sigma
+        self.rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.dist == "constant":
+            return self.mean
+        if self.dist == "uniform":
+            return max(0.0, self.rng.uniform(self.mean - self.spread, self.mean + self.spread))
+        return self.mean * self.rng.lognormvariate(0.0, self.sigma)
+
+
+def teacher_reply(rng: random.Random) -> str:
+    return json.dumps({
+        "score": rng.randint(40, 95),
+        "criteria": {"relevance": rng.randint(40, 95), "correctness": rng.randint(40, 95), "conciseness": rng.randint(40, 95)},
+        "feedback": "Simulated feedback.",
+        "suggested_prompt": None,
+    })
+
+
+class SimulatedClient(ModelClient):
+    """In-process ``ModelClient`` with simulated latency, errors and 429s.
+
+    ``role="teacher"`` returns evaluator-shaped JSON. Throttles and errors
+    raise ``httpx.HTTPStatusError`` like a real client that ran out of retries.
+    """
+
+    def __init__(self, role: str = "student", latency: LatencyModel | None = None, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, model: str = "sim-model", seed: int | None = 0) -> None:
+        self.role = role
+        self.latency = latency or LatencyModel(seed=seed)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.model = model
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def _fail(self, status: int) -> None:
+        request = httpx.Request("POST", "http://sim/chat/completions")
+        raise httpx.HTTPStatusError(f"simulated {status}", request=request, response=httpx.Response(status, request=request))
+
+    async def generate(self, prompt: str, **kwargs: Any) -> Dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            self._fail(429)
+        if roll < self.throttle_rate + self.error_rate:
+            self._fail(503)
+        text = teacher_reply(self.rng) if self.role == "teacher" else f"Simulated summary of {len(prompt)} chars."
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4, "total_tokens": (len(prompt) + len(text)) // 4}
+        return {"text": text, "raw": {"simulated": True}, "usage": usage}
+
+    def close(self) -> None:
+        return None
+
+
+def mock_transport(latency: LatencyModel | None = None, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                   retry_after: float = 0.05, role: str = "student", seed: int | None = 0) -> httpx.MockTransport:
+    """``httpx.MockTransport`` imitating an OpenAI-compatible ``/chat/completions`` endpoint."""
+    latency = latency or LatencyModel(seed=seed)
+    rng = random.Random(seed)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency.sample())
+        roll = rng.random()
+        if roll < throttle_rate:
+            return httpx.Response(429, headers={"Retry-After": f"{retry_after:g}"}, json={"error": "rate limited"})
+        if roll < throttle_rate + error_rate:
+            return httpx.Response(503, json={"error": "unavailable"})
+        body = json.loads(request.content or b"{}")
+        prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+        text = teacher_reply(rng) if role == "teacher" else f"Simulated summary of {len(prompt)} chars."
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4, "total_tokens": (len(prompt) + len(text)) // 4}
+        return httpx.Response(200, json={
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+            "model": body.get("model"),
+        })
+
+    return httpx.MockTransport(handler)
@@ -0,0 +1,126 @@
+"""Run the offline benchmark suite.
+
+    python -m benchmarks.run                 # all workloads, compare with baselines if present
+    python -m benchmarks.run --quick         # smaller workloads
+    python -m benchmarks.run --only cache_sqlite --only log_sink
+    python -m benchmarks.run --save-baseline # record current numbers as the baseline
+    python -m benchmarks.run --check         # fail unless a baseline exists and nothing regressed
+
+Baselines are machine-specific and not committed: run ``--save-baseline`` once
+on the machine (or CI runner) that will do the checks. Exits with status 1 when a workload regresses past ``--tolerance`` relative to
+the saved baseline (lower throughput, higher p95 latency or higher peak memory),
+or when a workload misses its absolute budget (e.g. ``cli_startup``).
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List
+import argparse
+import json
+import platform
+import sys
+import tracemalloc
+
+from .workloads import WORKLOADS
+
+
+DEFAULT_BASELINES = Path(__file__).with_name("baselines.json")
+
+
+def run_workload(name: str, scale: float) -> Dict[str, Any]:
+    tracemalloc.start()
+    try:
+        result = WORKLOADS[name](scale)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result["peak_memory_kb"] = peak / 1024
+    return result
+
+
+def check_budgets(results: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Absolute limits some workloads carry (``budget_p95``; ``heavy_imports`` must be empty)."""
+    problems = []
+    for name, res in results.items():
+        if res.get("budget_p95") is not None and res.get("p95") is not None and res["p95"] > res["budget_p95"]:
+            problems.append(f"{name}: p95 {res['p95']:.3f}s over budget {res['budget_p95']:.3f}s")
+        if res.get("heavy_imports"):
+            problems.append(f"{name}: imports {', '.join(res['heavy_imports'])} at startup")
+    return problems
+
+
+def compare(results: Dict[str, Dict[str, Any]], baselines: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """Human-readable regressions of ``results`` against ``baselines``."""
+    problems = []
+    for name, res in results.items():
+        base = baselines.get(name)
+        if not base:
+            continue
+        if base.get("throughput") and res.get("throughput") is not None and res["throughput"] < base["throughput"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {res['throughput']:.1f}/s < baseline {base['throughput']:.1f}/s")
+        for key in ("p95", "peak_memory_kb"):
+            if base.get(key) and res.get(key) is not None and res[key] > base[key] * (1 + tolerance):
+                problems.append(f"{name}: {key} {res[key]:.4g} > baseline {base[key]:.4g}")
+    return problems
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser("evo-prompt-bench")
+    parser.add_argument("--only", action="append", choices=sorted(WORKLOADS), help="Run only these workloads")
+    parser.add_argument("--quick", action="store_true", help="Run at 1/4 scale")
+    parser.add_argument("--scale", type=float, default=1.0, help="Workload size multiplier")
+    parser.add_argument("--baselines", type=str, default=str(DEFAULT_BASELINES), help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Require a baseline to compare against (exit 2 if missing)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--json", type=str, help="Also write the raw results to this file")
+    args = parser.parse_args(argv)
+    baseline_path = Path(args.baselines)
+    if args.check and not args.save_baseline and not baseline_path.exists():
+        # fail before running anything: there would be nothing to compare against
+        print(f"No baseline at {baseline_path}; record one first with --save-baseline", file=sys.stderr)
+        return 2
+
+    scale = args.scale * (0.25 if args.quick else 1.0)
+    names = args.only or list(WORKLOADS)
+    results = {}
+    print(f"{'workload':24} {'ops':>7} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>10}")
+    for name in names:
+        res = run_workload(name, scale)
+        results[name] = res
+
+        def ms(v: float | None) -> str:
+            return f"{v * 1000:9.3f}" if v is not None else f"{'-':>9}"
+
+        print(f"{name:24} {res['ops']:7d} {res['throughput'] or 0:10.1f} {ms(res['p50'])} {ms(res['p95'])} {ms(res['p99'])} {res['peak_memory_kb']:10.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    over_budget = check_budgets(results)
+    for p in over_budget:
+        print("OVER BUDGET:", p)
+
+    if args.save_baseline:
+        existing = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+        existing.update({name: {k: res.get(k) for k in ("throughput", "p50", "p95", "p99", "peak_memory_kb")} for name, res in results.items()})
+        existing["_meta"] = {"python": platform.python_version(), "platform": platform.platform(), "scale": scale}
+        baseline_path.write_text(json.dumps(existing, indent=2, sort_keys=True), encoding="utf-8")
+        print(f"Saved baseline to {baseline_path}")
+        return 0
+
+    if baseline_path.exists():
+        baselines = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baselines.get("_meta", {}).get("scale") not in (None, scale):
+            print(f"Note: baseline was recorded at scale {baselines['_meta']['scale']}, this run used {scale}")
+        problems = compare(results, baselines, args.tolerance)
+        for p in problems:
+            print("REGRESSION:", p)
+        return 1 if problems or over_budget else 0
+    print(f"No baseline at {baseline_path}; regressions were not checked (run --save-baseline first)")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
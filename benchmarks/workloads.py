@@ -0,0 +1,232 @@
+"""Benchmark workloads. Each takes a scale factor and returns raw measurements."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import asyncio
+import subprocess
+import sys
+import tempfile
+import time
+
+from evo_prompt.cache import Cache, SQLiteCache
+from evo_prompt.clients import OpenAICompatibleClient
+from evo_prompt.evaluator import Evaluator
+from evo_prompt.logger import JsonlLogSink
+from evo_prompt.metrics import Metrics
+from evo_prompt.optimizer import Optimizer
+from evo_prompt.prompt_store import PromptStore
+from evo_prompt.workflow import Workflow
+
+from .backends import LatencyModel, SimulatedClient, mock_transport
+
+
+def _result(ops: int, seconds: float, latencies: List[float], **extra: Any) -> Dict[str, Any]:
+    values = sorted(latencies)
+
+    def pct(p: float) -> float | None:
+        if not values:
+            return None
+        return values[min(len(values) - 1, max(0, int(round(p * len(values))) - 1))]
+
+    out = {
+        "ops": ops,
+        "seconds": seconds,
+        "throughput": ops / seconds if seconds > 0 else None,
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+    }
+    out.update(extra)
+    return out
+
+
+def _build_workflow(tmp: Path, student: Any, teacher: Any) -> Workflow:
+    store = PromptStore(tmp / "prompts")
+    store.add_or_update_prompt("bench", "Summarize the following text in three bullet points.")
+    evaluator = Evaluator(teacher)
+    return Workflow(
+        student, teacher, store, evaluator, Optimizer(store, evaluator), Cache(tmp / "cache"),
+        logs_dir=tmp / "logs", results_dir=tmp / "results", write_result_files=False,
+    )
+
+
+async def _drive_batch(wf: Workflow, n: int, concurrency: int) -> Dict[str, Any]:
+    pulled: Dict[int, float] = {}
+    latencies: List[float] = []
+
+    def inputs():
+        for i in range(n):
+            pulled[i] = time.perf_counter()
+            yield f"Benchmark input {i}: " + "lorem ipsum " * 20
+
+    def done(item: Dict[str, Any]) -> None:
+        latencies.append(time.perf_counter() - pulled[item["index"]])
+
+    start = time.perf_counter()
+    res = await wf.run_batch("bench", inputs(), concurrency=concurrency, on_result=done)
+    elapsed = time.perf_counter() - start
+    return _result(n, elapsed, latencies, errors=res["errors"])
+
+
+def workflow_batch(scale: float = 1.0) -> Dict[str, Any]:
+    """End-to-end Workflow.run_batch with healthy simulated backends."""
+    n = max(10, int(200 * scale))
+    with tempfile.TemporaryDirectory() as d:
+        student = SimulatedClient("student", LatencyModel("lognormal", mean=0.02, seed=1), seed=1)
+        teacher = SimulatedClient("teacher", LatencyModel("lognormal", mean=0.04, seed=2), seed=2)
+        wf = _build_workflow(Path(d), student, teacher)
+        try:
+            return asyncio.run(_drive_batch(wf, n, concurrency=16))
+        finally:
+            wf.close()
+
+
+def workflow_batch_faulty(scale: float = 1.0) -> Dict[str, Any]:
+    """run_batch against backends that fail 2% and throttle 5% of calls."""
+    n = max(10, int(200 * scale))
+    with tempfile.TemporaryDirectory() as d:
+        student = SimulatedClient("student", LatencyModel("lognormal", mean=0.02, seed=3), error_rate=0.02, throttle_rate=0.05, seed=3)
+        teacher = SimulatedClient("teacher", LatencyModel("lognormal", mean=0.04, seed=4), error_rate=0.02, throttle_rate=0.05, seed=4)
+        wf = _build_workflow(Path(d), student, teacher)
+        try:
+            return asyncio.run(_drive_batch(wf, n, concurrency=16))
+        finally:
+            wf.close()
+
+
+def http_client(scale: float = 1.0) -> Dict[str, Any]:
+    """OpenAICompatibleClient over httpx.MockTransport with 10% 429s (exercises retries)."""
+    n = max(10, int(200 * scale))
+    metrics = Metrics()
+    transport = mock_transport(LatencyModel("lognormal", mean=0.02, seed=5), throttle_rate=0.1, retry_after=0.02, seed=5)
+    client = OpenAICompatibleClient("bench-key", base_url="http://mock/v1", model="sim-model", transport=transport, metrics=metrics)
+    latencies: List[float] = []
+
+    async def one(i: int) -> None:
+        t = time.perf_counter()
+        await client.generate(f"Prompt {i} " + "x" * 200)
+        latencies.append(time.perf_counter() - t)
+
+    async def main() -> float:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n)))
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+        return elapsed
+
+    elapsed = asyncio.run(main())
+    stats = client.limiter.stats()
+    return _result(n, elapsed, latencies, retries=stats["retries"], throttle_wait_seconds=stats["throttle_wait_seconds"])
+
+
+def _cache_workload(make: Callable[[Path], Any], scale: float) -> Dict[str, Any]:
+    n = max(100, int(2000 * scale))
+    value = {"text": "cached response " * 20, "raw": {}, "usage": {"total_tokens": 100}}
+    latencies: List[float] = []
+    with tempfile.TemporaryDirectory() as d:
+        cache = make(Path(d))
+        start = time.perf_counter()
+        for i in range(n):
+            t = time.perf_counter()
+            cache.set(f"prompt {i}", "m", {"temperature": 0.0}, value)
+            latencies.append(time.perf_counter() - t)
+        for i in range(n):
+            t = time.perf_counter()
+            cache.get(f"prompt {i}", "m", {"temperature": 0.0})
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        cache.close()
+    return _result(2 * n, elapsed, latencies)
+
+
+def cache_file(scale: float = 1.0) -> Dict[str, Any]:
+    """File-per-key Cache: n sets then n gets."""
+    return _cache_workload(lambda d: Cache(d), scale)
+
+
+def cache_sqlite(scale: float = 1.0) -> Dict[str, Any]:
+    """SQLiteCache with a small hot tier: n sets then n gets."""
+    return _cache_workload(lambda d: SQLiteCache(d / "cache.sqlite3", hot_entries=256, sweep_interval=None), scale)
+
+
+def prompt_store(scale: float = 1.0) -> Dict[str, Any]:
+    """Append versions, then read the current text repeatedly."""
+    n = max(20, int(200 * scale))
+    latencies: List[float] = []
+    with tempfile.TemporaryDirectory() as d:
+        store = PromptStore(d)
+        text = "Write a concise, structured summary of the following article."
+        start = time.perf_counter()
+        for i in range(n):
+            text += f"\nConstraint {i}: be specific."
+            t = time.perf_counter()
+            store.add_or_update_prompt("bench", text, author="bench")
+            latencies.append(time.perf_counter() - t)
+        for _ in range(n * 10):
+            t = time.perf_counter()
+            store.get_current_text("bench")
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        size = sum(p.stat().st_size for p in Path(d).iterdir())
+    return _result(n * 11, elapsed, latencies, store_bytes=size)
+
+
+def log_sink(scale: float = 1.0) -> Dict[str, Any]:
+    """Enqueue records on JsonlLogSink and wait for them to reach disk."""
+    n = max(1000, int(20000 * scale))
+    record = {"kind": "student", "prompt": "p" * 200, "response": {"text": "r" * 400, "usage": {"total_tokens": 150}}}
+    latencies: List[float] = []
+    with tempfile.TemporaryDirectory() as d:
+        sink = JsonlLogSink(d, max_bytes=4 * 1024 * 1024)
+        start = time.perf_counter()
+        for _ in range(n):
+            t = time.perf_counter()
+            sink.write(record)
+            latencies.append(time.perf_counter() - t)
+        sink.flush()
+        elapsed = time.perf_counter() - start
+        sink.close()
+    return _result(n, elapsed, latencies)
+
+
+# p95 wall time for a fresh ``python -m evo_prompt.cli`` that does not call a model
+# (interpreter start included); see cli_startup
+STARTUP_BUDGET_SECONDS = 0.25
+_REPO_ROOT = Path(__file__).resolve().parents[1]
+_HEAVY_MODULES = ("httpx", "asyncio", "sqlite3")
+
+
+def cli_startup(scale: float = 1.0) -> Dict[str, Any]:
+    """Cold-start wall time of CLI invocations that need no model (``--help``, ``export``), in fresh interpreters."""
+    n = max(4, int(20 * scale))
+    commands = [
+        [sys.executable, "-m", "evo_prompt.cli", "--help"],
+        [sys.executable, "-m", "evo_prompt.cli", "export", "--db", "missing.sqlite3"],
+    ]
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for i in range(n):
+        t = time.perf_counter()
+        subprocess.run(commands[i % len(commands)], cwd=_REPO_ROOT, capture_output=True)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    probe = subprocess.run(
+        [sys.executable, "-c", f"import sys, evo_prompt.cli; print(','.join(m for m in {_HEAVY_MODULES!r} if m in sys.modules))"],
+        cwd=_REPO_ROOT, capture_output=True, text=True,
+    )
+    heavy = [m for m in probe.stdout.strip().split(",") if m]
+    return _result(n, elapsed, latencies, budget_p95=STARTUP_BUDGET_SECONDS, heavy_imports=heavy)
+
+
+WORKLOADS: Dict[str, Callable[[float], Dict[str, Any]]] = {
+    "workflow_batch": workflow_batch,
+    "workflow_batch_faulty": workflow_batch_faulty,
+    "http_client": http_client,
+    "cache_file": cache_file,
+    "cache_sqlite": cache_sqlite,
+    "prompt_store": prompt_store,
+    "log_sink": log_sink,
+    "cli_startup": cli_startup,
+}
@@ -1,21 +1,42 @@
 """EvoPrompt package initializer.
 
-Expose high-level components for convenience.
+Expose high-level components for convenience. They are imported on first
+access, so ``import evo_prompt`` (and the CLI) does not load httpx up front.
 """
 
-from .clients import ModelClient, OpenAICompatibleClient
-from .prompt_store import PromptStore
-from .config import Config, load_config
-from .logger import setup_file_logger, log_response
+from __future__ import annotations
 
-__all__ = [
-    "ModelClient",
-    "OpenAICompatibleClient",
-    "PromptStore",
-    "Config",
-    "load_config",
-    "setup_file_logger",
-    "log_response",
-]
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
 
+if TYPE_CHECKING:
+    from .clients import ModelClient, OpenAICompatibleClient
+    from .prompt_store import PromptStore
+    from .config import Config, load_config, resolve_config
+    from .logger import setup_file_logger, log_response
 
+_EXPORTS = {
+    "ModelClient": "clients",
+    "OpenAICompatibleClient": "clients",
+    "PromptStore": "prompt_store",
+    "Config": "config",
+    "load_config": "config",
+    "resolve_config": "config",
+    "setup_file_logger": "logger",
+    "log_response": "logger",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(__all__)
@@ -1,24 +1,38 @@
 from __future__ import annotations
 
+from collections import OrderedDict
 from pathlib import Path
+import asyncio
 import json
 import hashlib
-from typing import Any
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, TypeVar
 from datetime import datetime, timedelta
 
 
+T = TypeVar("T")
+
+
+def cache_key(prompt: str, model: str, params: dict) -> str:
+    h = hashlib.sha256()
+    h.update(prompt.encode("utf-8"))
+    h.update(model.encode("utf-8"))
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
 class Cache:
+    """File-backed cache: one JSON file per key under ``cache_dir``."""
+
     def __init__(self, cache_dir: Path | str = ".cache", ttl_seconds: int = 3600) -> None:
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.ttl = ttl_seconds
 
     def _key_for(self, prompt: str, model: str, params: dict) -> str:
-        h = hashlib.sha256()
-        h.update(prompt.encode("utf-8"))
-        h.update(model.encode("utf-8"))
-        h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
-        return h.hexdigest()
+        return cache_key(prompt, model, params)
 
     def get(self, prompt: str, model: str, params: dict) -> Any | None:
         key = self._key_for(prompt, model, params)
@@ -31,6 +45,7 @@ class Cache:
             if ts:
                 t = datetime.fromisoformat(ts)
                 if datetime.utcnow() - t > timedelta(seconds=self.ttl):
+                    path.unlink(missing_ok=True)
                     return None
             return obj.get("value")
         except Exception:
@@ -42,4 +57,253 @@ class Cache:
         obj = {"timestamp": datetime.utcnow().isoformat(), "value": value}
         path.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
 
+    def close(self) -> None:
+        return None
+
+
+class SQLiteCache(Cache):
+    """Single-file SQLite cache with an in-process LRU hot tier.
+
+    Entries are evicted least-recently-used first once ``max_entries`` or
+    ``max_bytes`` is exceeded, and a daemon thread deletes expired rows every
+    ``sweep_interval`` seconds. ``get``/``set`` keep the ``Cache`` signature.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = ".cache/cache.sqlite3",
+        ttl_seconds: int = 3600,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        hot_entries: int = 1024,
+        sweep_interval: float | None = 60.0,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.cache_dir = self.path.parent
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hot_entries = hot_entries
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries(created)")
+
+        # hot tier: key -> (created, value); hits there only mark the row as touched
+        self._hot: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._counters = {"hits": 0, "hot_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+        self._entries, self._bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+        self._stop = threading.Event()
+        self._sweeper = None
+        if sweep_interval:
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,), name="evo-cache-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return now - created > self.ttl
+
+    def _hot_put(self, key: str, created: float, value: Any) -> None:
+        if self.hot_entries <= 0:
+            return
+        self._hot[key] = (created, value)
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_entries:
+            self._hot.popitem(last=False)
+
+    def get(self, prompt: str, model: str, params: dict) -> Any | None:
+        key = self._key_for(prompt, model, params)
+        now = time.time()
+        with self._lock:
+            hot = self._hot.get(key)
+            if hot is not None:
+                if not self._expired(hot[0], now):
+                    self._hot.move_to_end(key)
+                    self._touched[key] = now
+                    self._counters["hits"] += 1
+                    self._counters["hot_hits"] += 1
+                    return hot[1]
+                self._delete(key)
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+
+            row = self._conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            if self._expired(row[1], now):
+                self._delete(key)
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+            try:
+                value = json.loads(row[0])
+            except Exception:
+                self._counters["misses"] += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._hot_put(key, row[1], value)
+            self._counters["hits"] += 1
+            return value
+
+    def set(self, prompt: str, model: str, params: dict, value: Any) -> None:
+        key = self._key_for(prompt, model, params)
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries(key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, size, now, now),
+            )
+            if old is None:
+                self._entries += 1
+                self._bytes += size
+            else:
+                self._bytes += size - old[0]
+            self._touched.pop(key, None)
+            self._hot_put(key, now, value)
+            self._counters["sets"] += 1
+            self._evict()
+
+    def _delete(self, key: str) -> None:
+        row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._entries -= 1
+            self._bytes -= row[0]
+        self._hot.pop(key, None)
+        self._touched.pop(key, None)
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self) -> None:
+        over_entries = self.max_entries is not None and self._entries > self.max_entries
+        over_bytes = self.max_bytes is not None and self._bytes > self.max_bytes
+        if not (over_entries or over_bytes):
+            return
+        self._flush_touched()
+        cursor = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC")
+        victims = []
+        entries, nbytes = self._entries, self._bytes
+        for key, size in cursor:
+            if not ((self.max_entries is not None and entries > self.max_entries) or (self.max_bytes is not None and nbytes > self.max_bytes)):
+                break
+            victims.append(key)
+            entries -= 1
+            nbytes -= size
+        cursor.close()
+        for key in victims:
+            self._delete(key)
+        self._counters["evictions"] += len(victims)
+
+    def sweep(self) -> int:
+        """Delete expired entries now; returns how many were removed."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            self._flush_touched()
+            removed = self._conn.execute("SELECT key FROM entries WHERE created < ?", (cutoff,)).fetchall()
+            self._conn.execute("DELETE FROM entries WHERE created < ?", (cutoff,))
+            for (key,) in removed:
+                self._hot.pop(key, None)
+            self._entries, self._bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            self._counters["expired"] += len(removed)
+            return len(removed)
+
+    def _sweep_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._counters)
+            out.update({"entries": self._entries, "bytes": self._bytes, "hot_entries": len(self._hot)})
+            lookups = out["hits"] + out["misses"]
+            out["hit_rate"] = out["hits"] / lookups if lookups else 0.0
+            return out
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=1.0)
+        with self._lock:
+            try:
+                self._flush_touched()
+            finally:
+                self._conn.close()
+
+
+class InflightRequests:
+    """Coalesce concurrent identical requests (singleflight).
+
+    The first caller for a key runs ``factory``; callers arriving while it is
+    pending await the same future instead of issuing their own request. If
+    the leader is cancelled, a waiting caller takes over.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            fut = self._pending.get(key)
+            if fut is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise
+                self.coalesced -= 1
+
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[key] = fut
+        self.leaders += 1
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as exc:
+            fut.set_exception(exc)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            if self._pending.get(key) is fut:
+                del self._pending[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "pending": len(self._pending)}
+
 
+def open_cache(backend: str = "file", cache_dir: Path | str = ".cache", ttl_seconds: int = 3600, **kwargs: Any) -> Cache:
+    """Build a cache backend by name (``"file"`` or ``"sqlite"``)."""
+    if backend == "file":
+        return Cache(cache_dir, ttl_seconds=ttl_seconds)
+    if backend == "sqlite":
+        return SQLiteCache(Path(cache_dir) / "cache.sqlite3", ttl_seconds=ttl_seconds, **kwargs)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List
+import asyncio
+
+from .clients import merge_usage
+from .tokens import estimate_tokens
+from .workflow import Workflow, compose_prompt
+
+
+REDUCE_PROMPT = (
+    "The task below was applied separately to consecutive, slightly overlapping parts of one long document.\n"
+    "Combine the partial results into a single answer to the task for the whole document: merge duplicates\n"
+    "caused by the overlap, keep the original order, and follow the task's required format.\n\n"
+    "Task:\n{task}\n\nPartial results:\n{partials}"
+)
+
+
+def _pieces(lines: Iterable[str], max_tokens: int) -> Iterator[str]:
+    """Lines, with any line over ``max_tokens`` cut into pieces that fit."""
+    for line in lines:
+        if estimate_tokens(line) <= max_tokens:
+            yield line
+            continue
+        start, budget = 0, 0.0
+        for i, c in enumerate(line):
+            cost = 0.25 if c < "\x80" else 1.0
+            if budget + cost > max_tokens:
+                yield line[start:i]
+                start, budget = i, 0.0
+            budget += cost
+        if start < len(line):
+            yield line[start:]
+
+
+def _tail(text: str, max_tokens: int) -> str:
+    """The longest suffix of ``text`` within ``max_tokens``, starting at a word boundary if there is one."""
+    budget = 0.0
+    start = len(text)
+    while start > 0:
+        cost = 0.25 if text[start - 1] < "\x80" else 1.0
+        if budget + cost > max_tokens:
+            break
+        budget += cost
+        start -= 1
+    if start > 0 and text[start - 1] not in " \t":
+        space = text.find(" ", start)
+        if space != -1:
+            start = space + 1
+    return text[start:]
+
+
+def _head(text: str, max_tokens: int) -> str:
+    """The longest prefix of ``text`` within ``max_tokens``."""
+    return next(_pieces([text], max_tokens), "")
+
+
+class _Excerpt:
+    """Openings of evenly spaced chunks within a token budget, kept while the document streams by.
+
+    When more than ``budget // piece_tokens`` openings are held, every other
+    one is dropped and the stride doubles, so memory stays bounded however
+    long the document is.
+    """
+
+    def __init__(self, budget: int, piece_tokens: int) -> None:
+        self.piece_tokens = piece_tokens
+        self.max_pieces = max(1, budget // max(1, piece_tokens))
+        self.stride = 1
+        self.pieces: List[tuple] = []
+
+    def add(self, chunk: Dict[str, Any]) -> None:
+        if chunk["index"] % self.stride:
+            return
+        self.pieces.append((chunk["index"], _head(chunk["text"], self.piece_tokens)))
+        if len(self.pieces) > self.max_pieces:
+            self.stride *= 2
+            self.pieces = [p for p in self.pieces if p[0] % self.stride == 0]
+
+    def text(self) -> str:
+        return "\n\n".join(f"[Chunk {index} opening]\n{text}" for index, text in self.pieces)
+
+
+def iter_chunks(lines: Iterable[str], max_tokens: int = 2000, overlap_tokens: int = 200) -> Iterator[Dict[str, Any]]:
+    """Group ``lines`` (e.g. an open file) into chunks of at most ``max_tokens``.
+
+    Chunks break at line boundaries where possible, and each chunk starts with
+    the last lines of the previous one, up to ``overlap_tokens``, so content
+    cut at a boundary is seen whole at least once. Lines are consumed lazily;
+    only the current chunk is held in memory. Yields ``{index, text, tokens}``.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+    buf: List[str] = []
+    sizes: List[int] = []
+    fresh = False  # buf has lines not emitted yet
+    index = 0
+    for piece in _pieces(lines, max_tokens - overlap_tokens):
+        size = estimate_tokens(piece)
+        if fresh and sum(sizes) + size > max_tokens:
+            yield {"index": index, "text": "".join(buf), "tokens": sum(sizes)}
+            index += 1
+            # keep a tail of the emitted chunk as overlap: whole lines, then part of the next one
+            keep = 0
+            total = 0
+            for s in reversed(sizes):
+                if total + s > overlap_tokens:
+                    break
+                total += s
+                keep += 1
+            tail, tail_sizes = (buf[-keep:], sizes[-keep:]) if keep else ([], [])
+            if keep < len(buf) and total < overlap_tokens:
+                partial = _tail(buf[-keep - 1], overlap_tokens - total)
+                if partial:
+                    tail.insert(0, partial)
+                    tail_sizes.insert(0, estimate_tokens(partial))
+            buf, sizes = tail, tail_sizes
+        buf.append(piece)
+        sizes.append(size)
+        fresh = True
+    if fresh:
+        yield {"index": index, "text": "".join(buf), "tokens": sum(sizes)}
+
+
+def iter_file_chunks(path: Path | str, max_tokens: int = 2000, overlap_tokens: int = 200) -> Iterator[Dict[str, Any]]:
+    """``iter_chunks`` over a UTF-8 text file, read line by line."""
+    with Path(path).open("r", encoding="utf-8") as fh:
+        yield from iter_chunks(fh, max_tokens, overlap_tokens)
+
+
+class MapReduce:
+    """Run a prompt over a long document chunk by chunk and combine the results.
+
+    Map: the student answers the stored prompt for each chunk, at most
+    ``concurrency`` at a time while the document is still being read. Every
+    chunk is an ordinary cached ``generate_student`` call, so rerunning
+    after a failure only repeats the chunks that failed. Reduce: the partial
+    outputs are merged with ``REDUCE_PROMPT`` (in groups of at most
+    ``reduce_tokens``, repeated until one answer is left), and the final
+    answer is evaluated by the teacher like a single-request output, with
+    the openings of evenly spaced chunks (at most ``eval_context_tokens``)
+    standing in for the document it cannot see whole.
+    """
+
+    def __init__(
+        self,
+        workflow: Workflow,
+        chunk_tokens: int = 2000,
+        overlap_tokens: int = 200,
+        concurrency: int = 4,
+        reduce_tokens: int = 6000,
+        retries: int = 1,
+        eval_context_tokens: int = 4000,
+        excerpt_tokens: int = 300,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self.workflow = workflow
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.concurrency = concurrency
+        self.reduce_tokens = reduce_tokens
+        self.retries = retries
+        self.eval_context_tokens = eval_context_tokens
+        self.excerpt_tokens = excerpt_tokens
+
+    def chunks(self, source: Path | str | Iterable[str]) -> Iterator[Dict[str, Any]]:
+        if isinstance(source, (str, Path)):
+            return iter_file_chunks(source, self.chunk_tokens, self.overlap_tokens)
+        return iter_chunks(source, self.chunk_tokens, self.overlap_tokens)
+
+    async def _map_one(self, base_text: str, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        wf = self.workflow
+        prompt_text = compose_prompt(base_text, chunk["text"])
+        out = {"index": chunk["index"], "tokens": chunk["tokens"], "error": None, "response": None}
+        for attempt in range(self.retries + 1):
+            try:
+                with wf.metrics.span("chunk_map"):
+                    out["response"] = await wf.generate_student(prompt_text)
+                out["error"] = None
+                return out
+            except Exception as exc:
+                out["error"] = repr(exc)
+                wf.logger.warning(f"Chunk {chunk['index']} attempt {attempt + 1} failed: {exc!r}")
+        return out
+
+    async def map(
+        self, base_text: str, source: Path | str | Iterable[str], excerpt: _Excerpt | None = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Per-chunk results in completion order (``index``, ``tokens``, ``response``, ``error``)."""
+        pending: set[asyncio.Task] = set()
+        try:
+            for chunk in self.chunks(source):
+                if excerpt is not None:
+                    excerpt.add(chunk)
+                pending.add(asyncio.ensure_future(self._map_one(base_text, chunk)))
+                if len(pending) < self.concurrency:
+                    continue
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _groups(self, partials: List[str]) -> List[List[str]]:
+        groups: List[List[str]] = [[]]
+        size = 0
+        for text in partials:
+            tokens = estimate_tokens(text)
+            if groups[-1] and size + tokens > self.reduce_tokens:
+                groups.append([])
+                size = 0
+            groups[-1].append(text)
+            size += tokens
+        return groups
+
+    async def reduce(self, base_text: str, partials: List[str]) -> Dict[str, Any]:
+        """Merge partial outputs into one student response (``reduce_levels`` tells how many passes)."""
+        wf = self.workflow
+        usage: List[Dict[str, Any]] = []
+        levels = 0
+        while len(partials) > 1:
+            levels += 1
+
+            async def merge(group: List[str]) -> str:
+                if len(group) == 1:
+                    return group[0]
+                body = "\n\n".join(f"[Part {i}]\n{text}" for i, text in enumerate(group, 1))
+                with wf.metrics.span("chunk_reduce"):
+                    resp = await wf.generate_student(REDUCE_PROMPT.format(task=base_text, partials=body))
+                if not resp.get("cached"):
+                    usage.append(resp.get("usage", {}))
+                return resp.get("text", "")
+
+            groups = self._groups(partials)
+            if len(groups) == len(partials):
+                # every partial alone exceeds the budget; merge pairwise rather than loop forever
+                groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+            partials = list(await asyncio.gather(*(merge(g) for g in groups)))
+        return {"text": partials[0] if partials else "", "usage": merge_usage(usage), "reduce_levels": levels}
+
+    async def run(
+        self,
+        prompt_name: str,
+        source: Path | str | Iterable[str],
+        use_teacher: bool = True,
+        propose: bool = True,
+    ) -> Dict[str, Any]:
+        """Map, reduce, evaluate and (optionally) propose an improvement; persisted like ``run_iteration``.
+
+        Raises ``RuntimeError`` listing the failed chunks if any chunk still
+        fails after ``retries``; the successful ones are cached for the rerun.
+        """
+        wf = self.workflow
+        with wf.metrics.span("prompt_load"):
+            head = wf._load_head(prompt_name)
+        base_text = head.get("text", "")
+
+        excerpt = _Excerpt(self.eval_context_tokens, self.excerpt_tokens)
+        results = [r async for r in self.map(base_text, source, excerpt)]
+        results.sort(key=lambda r: r["index"])
+        failed = [r["index"] for r in results if r["error"]]
+        if failed:
+            raise RuntimeError(f"{len(failed)}/{len(results)} chunks failed (indices {failed}); rerun to retry only those")
+
+        reduced = await self.reduce(base_text, [r["response"].get("text", "") for r in results])
+        label = f"[{source if isinstance(source, (str, Path)) else 'document'}: {len(results)} chunks, excerpts below]"
+        prompt_text = compose_prompt(base_text, label + "\n" + excerpt.text())
+        student_resp = {
+            "text": reduced["text"],
+            "raw": {"map_reduce": True},
+            # chunks served from the cache were paid for by an earlier run
+            "usage": merge_usage([r["response"].get("usage", {}) for r in results if not r["response"].get("cached")] + [reduced["usage"]]),
+            "chunks": len(results),
+            "reduce_levels": reduced["reduce_levels"],
+        }
+        resp_id = wf._log_student(prompt_name, prompt_text, student_resp)
+        evaluation = await wf.evaluate_output(prompt_name, resp_id, prompt_text, student_resp) if use_teacher else None
+        proposed: Dict[str, Any] = {}
+        if propose:
+            with wf.metrics.span("optimize"):
+                proposed = await wf.optimizer.propose_improvement(prompt_name, student_resp["text"], evaluation or {})
+
+        item = {"id": resp_id, "prompt_text": prompt_text, "student_response": student_resp, "evaluation": evaluation}
+        out = {
+            "prompt_name": prompt_name,
+            "student_response": student_resp,
+            "evaluation": evaluation,
+            "proposed": proposed,
+            "chunks": [{"index": r["index"], "tokens": r["tokens"]} for r in results],
+            # what the teacher saw of the document
+            "eval_context": {"chunks_sampled": len(excerpt.pieces), "stride": excerpt.stride},
+        }
+        wf._persist_iteration(prompt_name, head.get("version"), item, out)
+        return out
@@ -1,54 +1,503 @@
 from __future__ import annotations
 
 import argparse
-import asyncio
+import json
+import sys
 from pathlib import Path
-from .config import interactive_config_prompt, Config
-from .prompt_store import PromptStore
-from .clients import OpenAICompatibleClient
-from .evaluator import Evaluator
-from .optimizer import Optimizer
-from .cache import Cache
-from .workflow import Workflow
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Sequence
+from .config import interactive_config_prompt, resolve_config, Config
 
+if TYPE_CHECKING:
+    from .clients import ConnectionPool, ModelClient
+    from .metrics import Metrics
+    from .prescorers import PreScorer
+    from .workflow import Workflow
 
-async def run_once(config: Config, prompt_name: str, input_text: str) -> None:
-    student = OpenAICompatibleClient(config.student_api_key or "", base_url=config.student_base_url, model=config.student_model)
-    teacher = OpenAICompatibleClient(config.teacher_api_key or "", base_url=config.teacher_base_url, model=config.teacher_model)
+# Everything beyond argparse/json/config is imported inside the functions that
+# need it, so ``--help``, ``stats``, ``export`` or ``jobs`` never load httpx or
+# asyncio. ``benchmarks`` has a ``cli_startup`` workload guarding this.
+
+
+def build_prescorers(config: Config) -> List[PreScorer]:
+    from .prescorers import JSONScorer, LengthScorer, NonEmptyScorer, RegexScorer
+
+    scorers: List[PreScorer] = [NonEmptyScorer()]
+    if config.output_max_chars:
+        scorers.append(LengthScorer(max_chars=config.output_max_chars))
+    if config.output_regex:
+        scorers.append(RegexScorer(config.output_regex))
+    if config.output_json_schema:
+        scorers.append(JSONScorer(json.loads(Path(config.output_json_schema).read_text(encoding="utf-8"))))
+    return scorers
+
+
+def build_client(api_key: str | None, base_url: str | None, model: str, backends: List[Dict[str, Any]] | None,
+                 config: Config, metrics: Metrics, pool: ConnectionPool) -> ModelClient:
+    """One endpoint, or a RoutingClient over it plus ``backends``."""
+    from .clients import OpenAICompatibleClient
+    from .routing import RoutingClient
+
+    client = OpenAICompatibleClient(api_key or "", base_url=base_url, model=model, metrics=metrics, pool=pool)
+    if not backends:
+        return client
+    extra = [
+        OpenAICompatibleClient(b.get("api_key") or api_key or "", base_url=b.get("base_url"), model=b.get("model") or model, metrics=metrics, pool=pool)
+        for b in backends
+    ]
+    return RoutingClient([client] + extra, model=model, hedge_budget=config.hedge_budget, metrics=metrics)
+
+
+def build_workflow(config: Config) -> Workflow:
+    from .cache import InflightRequests, open_cache
+    from .clients import ConnectionPool
+    from .evaluator import Evaluator
+    from .metrics import Metrics
+    from .optimizer import Optimizer
+    from .prompt_store import PromptStore
+    from .replay import ReplayClient
+    from .similarity import SimilarityCache
+    from .workflow import Workflow
+
+    metrics = Metrics()
+    pool = ConnectionPool(
+        max_connections=config.http_max_connections,
+        max_keepalive_connections=config.http_max_keepalive,
+        keepalive_expiry=config.http_keepalive_expiry,
+    )
+    student = build_client(config.student_api_key, config.student_base_url, config.student_model, config.student_backends, config, metrics, pool)
+    teacher = build_client(config.teacher_api_key, config.teacher_base_url, config.teacher_model, config.teacher_backends, config, metrics, pool)
+    if config.replay_mode:
+        cassettes = Path(config.cassette_dir)
+        student = ReplayClient(student, cassettes / "student.jsonl", mode=config.replay_mode, log_dirs=[config.logs_dir])
+        teacher = ReplayClient(teacher, cassettes / "teacher.jsonl", mode=config.replay_mode)
     store = PromptStore(config.prompts_dir)
-    evaluator = Evaluator(teacher)
+    inflight = InflightRequests()
+    if config.cache_backend == "sqlite":
+        cache = open_cache("sqlite", config.cache_dir, ttl_seconds=config.cache_ttl_seconds, max_entries=config.cache_max_entries)
+    else:
+        cache = open_cache(config.cache_backend, config.cache_dir, ttl_seconds=config.cache_ttl_seconds)
+    # the file backend cannot enforce eval_cache_max_entries, so verdicts always use SQLite
+    eval_cache = open_cache("sqlite", Path(config.cache_dir) / "evaluations", ttl_seconds=config.eval_cache_ttl_seconds,
+                            max_entries=config.eval_cache_max_entries)
+    similar = config.similarity_threshold is not None
+    if similar:
+        cache = SimilarityCache(cache, threshold=config.similarity_threshold)
+        if config.similarity_for_evaluations:
+            eval_cache = SimilarityCache(eval_cache, threshold=config.similarity_threshold)
+    evaluator = Evaluator(teacher, inflight=inflight, metrics=metrics, cache=eval_cache, prescorers=build_prescorers(config),
+                          allow_similar=similar and config.similarity_for_evaluations, prescorer_weight=config.prescorer_weight)
     optimizer = Optimizer(store, evaluator)
-    cache = Cache()
-    wf = Workflow(student, teacher, store, evaluator, optimizer, cache)
+    return Workflow(student, teacher, store, evaluator, optimizer, cache, logs_dir=config.logs_dir, results_dir=config.results_dir,
+                    inflight=inflight, metrics=metrics, allow_similar=similar)
+
+
+async def finish_run(wf: Workflow, config: Config, show_summary: bool = False) -> None:
+    """Flush logs, release connections, export metrics and optionally print the per-run latency summary."""
+    from .similarity import SimilarityCache
+
+    try:
+        wf.close()
+    finally:
+        await wf.student.aclose()
+        await wf.teacher.aclose()
+    if config.metrics_file:
+        wf.metrics.write_prometheus(config.metrics_file)
+    if show_summary:
+        summary = wf.metrics.summary()
+        print("Stage latency (s):")
+        for stage, h in sorted(summary["stages"].items()):
+            print(f"  {stage}: n={h['count']} p50={h['p50']:.3f} p95={h['p95']:.3f} p99={h['p99']:.3f}")
+        print(f"Estimated cost: ${summary['estimated_cost_total_usd']:.4f}")
+        avoided = sum(v for k, v in summary["counters"].items() if k.startswith("evo_teacher_calls_avoided_total"))
+        if avoided:
+            print(f"Teacher calls avoided: {avoided:g}")
+        for role, cache in (("student", wf.cache), ("evaluation", wf.evaluator.cache)):
+            if isinstance(cache, SimilarityCache):
+                s = cache.stats()
+                sim = s["hit_similarity"]
+                print(f"Similar-cache ({role}): {s['hits']}/{s['lookups']} hits ({s['hit_rate']:.0%}) at threshold {s['threshold']}, "
+                      f"hit similarity min={sim['min']} p50={sim['p50']}, near misses p50={s['near_miss_similarity']['p50']}")
+
+
+def iter_dataset(path: Path | str) -> Iterator[str]:
+    """Lazily read inputs from a JSONL file.
+
+    Each line is either a JSON string or an object with an ``input`` key.
+    """
+    with Path(path).open("r", encoding="utf-8") as fh:
+        for lineno, line in enumerate(fh, 1):
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            if isinstance(obj, dict):
+                obj = obj.get("input")
+            if not isinstance(obj, str):
+                raise ValueError(f"{path}:{lineno}: expected a string or an object with an 'input' key")
+            yield obj
+
+
+async def run_once(config: Config, prompt_name: str, input_text: str) -> None:
+    wf = build_workflow(config)
+    try:
+        result = await wf.run_iteration(prompt_name, input_text, use_teacher=True)
+        print("Evaluation score:", result.get("evaluation", {}).get("score"))
+        print("Suggested prompt change summary:", result.get("proposed", {}).get("change_summary"))
+    finally:
+        await finish_run(wf, config)
+
+
+async def run_chunked(config: Config, prompt_name: str, path: Path | str) -> None:
+    """``run_once`` for a long input file: read lazily, map over chunks, reduce, evaluate."""
+    from .chunking import MapReduce
+
+    wf = build_workflow(config)
+    mr = MapReduce(wf, chunk_tokens=config.chunk_tokens, overlap_tokens=config.chunk_overlap_tokens, concurrency=config.chunk_concurrency)
+    try:
+        result = await mr.run(prompt_name, path, use_teacher=True)
+        print(f"Chunks: {len(result['chunks'])}, reduce passes: {result['student_response']['reduce_levels']}")
+        print("Evaluation score:", (result.get("evaluation") or {}).get("score"))
+        print("Suggested prompt change summary:", result.get("proposed", {}).get("change_summary"))
+    finally:
+        await finish_run(wf, config)
 
-    result = await wf.run_iteration(prompt_name, input_text, use_teacher=True)
-    print("Evaluation score:", result.get("evaluation", {}).get("score"))
-    print("Suggested prompt change summary:", result.get("proposed", {}).get("change_summary"))
+
+async def run_dataset(config: Config, prompt_name: str, dataset: Path | str, concurrency: int) -> None:
+    wf = build_workflow(config)
+
+    def report(item: dict) -> None:
+        if item["error"]:
+            print(f"[{item['index']}] error: {item['error']}")
+        else:
+            print(f"[{item['index']}] score: {(item.get('evaluation') or {}).get('score')}")
+
+    try:
+        result = await wf.run_batch(prompt_name, iter_dataset(dataset), concurrency=concurrency, on_result=report)
+        stats = result["stats"]
+        print(f"Scored {stats['count']}/{result['total']} inputs ({result['errors']} errors)")
+        print("Mean score:", stats["mean"], "stdev:", stats["stdev"], "min:", stats["min"], "max:", stats["max"])
+    finally:
+        await finish_run(wf, config, show_summary=True)
+
+
+def print_stats(db: Path | str, prompt_name: str, model: str | None = None, as_json: bool = False) -> None:
+    from .results_store import ResultsStore
+
+    if not Path(db).exists():
+        raise SystemExit(f"Results store not found: {db}")
+    store = ResultsStore(db)
+    try:
+        report = {
+            "versions": store.version_stats(prompt_name, model=model),
+            "criteria": store.criteria_breakdown(prompt_name),
+            "tokens": store.token_usage(prompt_name),
+        }
+    finally:
+        store.close()
+
+    if as_json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    def fmt(v: object) -> str:
+        return f"{v:.2f}" if isinstance(v, float) else str(v)
+
+    print(f"Scores for '{prompt_name}' by version:")
+    print("  version  count  mean  stdev  min  p50  p90  p99  max")
+    for row in report["versions"]:
+        print("  " + "  ".join(fmt(row[k]) for k in ("version", "count", "mean", "stdev", "min", "p50", "p90", "p99", "max")))
+    if report["criteria"]:
+        print("Criteria:")
+        for row in report["criteria"]:
+            print(f"  v{row['version']} {row['criterion']}: mean {fmt(row['mean'])} (n={row['count']})")
+    print("Token usage:")
+    for row in report["tokens"]:
+        print(f"  {row['model']}: {row['results']} results ({row['cached_results']} from cache), {row['total_tokens']} tokens")
+
+
+def submit_jobs(queue_path: Path | str, prompt_name: str, run_id: str | None = None, dataset: Path | str | None = None,
+                input_text: str | None = None, rounds: int = 0) -> str:
+    """Enqueue a dataset scoring run and/or a chain of optimization rounds; returns the run id.
+
+    Re-submitting with the same ``run_id`` only adds jobs that do not exist yet.
+    """
+    import uuid
+    from .jobs import JobQueue
+
+    run_id = run_id or uuid.uuid4().hex[:12]
+    queue = JobQueue(queue_path)
+    try:
+        if dataset:
+            ids = queue.enqueue_many(
+                {"kind": "score", "run_id": run_id, "dedupe_key": f"{run_id}:score:{i}", "payload": {"prompt_name": prompt_name, "input": text}}
+                for i, text in enumerate(iter_dataset(dataset))
+            )
+            print(f"Dataset: {len(ids)} score jobs (already queued/finished ones are kept)")
+        if input_text is not None and rounds > 0:
+            start = queue.get_checkpoint(run_id, "last_round", 0) + 1
+            if start <= rounds:
+                payload = {"prompt_name": prompt_name, "input": input_text, "round": start, "rounds": rounds}
+                queue.enqueue("optimize", payload, run_id=run_id, dedupe_key=f"{run_id}:optimize:{start}")
+                print(f"Queued optimization rounds {start}-{rounds}")
+        print("Run id:", run_id, queue.counts(run_id))
+    finally:
+        queue.close()
+    return run_id
+
+
+async def work(config: Config, queue_path: Path | str, concurrency: int, exit_when_idle: bool) -> Dict[str, int]:
+    from .jobs import JobQueue
+    from .worker import run_worker
+
+    wf = build_workflow(config)
+    queue = JobQueue(queue_path)
+    try:
+        return await run_worker(queue, wf, concurrency=concurrency, exit_when_idle=exit_when_idle)
+    finally:
+        queue.close()
+        await finish_run(wf, config)
+
+
+def _worker_process(config: Config, queue_path: str, concurrency: int, exit_when_idle: bool) -> None:
+    import asyncio
+    import multiprocessing
+
+    try:
+        counts = asyncio.run(work(config, queue_path, concurrency, exit_when_idle))
+    except KeyboardInterrupt:
+        return
+    print(f"Worker {multiprocessing.current_process().name} finished: {counts}")
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser("evo-prompt")
+def run_workers(config: Config, queue_path: Path | str, processes: int, concurrency: int, exit_when_idle: bool) -> None:
+    """Run ``processes`` worker processes (each with ``concurrency`` job slots) on one queue."""
+    import multiprocessing
+
+    if processes <= 1:
+        _worker_process(config, str(queue_path), concurrency, exit_when_idle)
+        return
+    procs = [
+        multiprocessing.Process(target=_worker_process, args=(config, str(queue_path), concurrency, exit_when_idle), name=f"evo-worker-{i}")
+        for i in range(processes)
+    ]
+    for proc in procs:
+        proc.start()
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+
+
+def print_jobs(queue_path: Path | str, run_id: str | None, retry_failed: bool) -> None:
+    from .jobs import JobQueue
+
+    if not Path(queue_path).exists():
+        raise SystemExit(f"Job queue not found: {queue_path}")
+    queue = JobQueue(queue_path)
+    try:
+        if retry_failed:
+            print(f"Re-queued {queue.retry_failed(run_id)} failed jobs")
+        print(json.dumps(queue.counts(run_id)))
+        for job in queue.jobs(run_id=run_id, status="failed"):
+            print(f"  failed #{job['id']} {job['kind']} after {job['attempts']} attempts: {job['error']}")
+    finally:
+        queue.close()
+
+
+def export_results(db: Path | str, output: Path | str | None = None, prompt_name: str | None = None, version: int | None = None,
+                   model: str | None = None, fmt: str = "jsonl") -> int:
+    """Write result rows (newest first, without payloads) as JSONL or CSV to ``output`` or stdout."""
+    from .results_store import ResultsStore
+
+    if not Path(db).exists():
+        raise SystemExit(f"Results store not found: {db}")
+    store = ResultsStore(db)
+    fh = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    count = 0
+    try:
+        rows = store.query(prompt_name, version=version, model=model)
+        if fmt == "csv":
+            import csv
+
+            writer = None
+            for row in rows:
+                if writer is None:
+                    writer = csv.DictWriter(fh, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+    finally:
+        store.close()
+        if output:
+            fh.close()
+    return count
+
+
+def run_bench(argv: Sequence[str]) -> int:
+    """Delegate to ``benchmarks.run`` (only available from a source checkout)."""
+    try:
+        from benchmarks.run import main as bench_main
+    except ImportError:
+        raise SystemExit("The benchmark suite is not importable; run from the repository root.")
+    return bench_main(list(argv))
+
+
+def run_config(args: argparse.Namespace) -> Config:
+    """Config for a run: flags, then EVO_* environment, then the config file.
+
+    Only when none of them names an endpoint or key, stdin is a terminal and
+    ``--no-input`` is not given, the interactive prompt is used instead.
+    """
+    overrides = {
+        "metrics_file": args.metrics_file,
+        "replay_mode": args.replay,
+        "cassette_dir": args.cassette_dir,
+        "similarity_threshold": args.similar,
+        "student_model": args.student_model,
+        "teacher_model": args.teacher_model,
+    }
+    cfg = resolve_config(args.config, overrides)
+    unconfigured = not (cfg.student_api_key or cfg.student_base_url or cfg.replay_mode)
+    if unconfigured and not args.no_input and sys.stdin.isatty():
+        cfg = interactive_config_prompt()
+        for name, value in overrides.items():
+            if value is not None:
+                setattr(cfg, name, value)
+    return cfg
+
+
+def _run_flags(suppress: bool = False) -> argparse.ArgumentParser:
+    """Config flags shared by the top-level parser and the run-type subcommands.
+
+    Subcommand copies use ``argparse.SUPPRESS`` defaults so that a flag given
+    before the subcommand (``evo-prompt --replay strict run ...``) is not
+    reset by the subparser.
+    """
+    extra: Dict[str, Any] = {"default": argparse.SUPPRESS} if suppress else {}
+    flags = argparse.ArgumentParser(add_help=False)
+    flags.add_argument("--config", type=str, help="JSON config file (default: $EVO_CONFIG or ./config.json if present)", **extra)
+    flags.add_argument("--student-model", type=str, help="Override student_model", **extra)
+    flags.add_argument("--teacher-model", type=str, help="Override teacher_model", **extra)
+    flags.add_argument("--metrics-file", type=str, help="Write Prometheus text metrics here after the run", **extra)
+    flags.add_argument("--replay", choices=["strict", "record", "passthrough"], help="Serve model calls from recorded cassettes/logs", **extra)
+    flags.add_argument("--cassette-dir", type=str, help="Directory for replay cassettes (default: cassettes)", **extra)
+    flags.add_argument("--similar", type=float, metavar="THRESHOLD", help="Reuse cached student outputs for near-identical prompts (similarity 0-1)", **extra)
+    flags.add_argument("--no-input", action="store_true", help="Never prompt for configuration (for unattended runs)", **extra)
+    return flags
+
+
+def _read_input(value: str) -> str:
+    p = Path(value)
+    return p.read_text(encoding="utf-8") if p.exists() else value
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser("evo-prompt", parents=[_run_flags()])
+    run_flags = _run_flags(suppress=True)
     parser.add_argument("--init", action="store_true", help="Run interactive config and create sample files")
     parser.add_argument("--prompt", type=str, help="Prompt name to run")
     parser.add_argument("--input", type=str, help="Input text or path to file")
+    parser.add_argument("--dataset", type=str, help="JSONL file of inputs to score the prompt against")
+    parser.add_argument("--chunked", action="store_true", help="Treat --input as a long document: chunk, map concurrently, reduce")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max in-flight inputs for --dataset")
+
+    sub = parser.add_subparsers(dest="command")
+    run = sub.add_parser("run", parents=[run_flags], help="One iteration (student, teacher, proposal) on an input")
+    run.add_argument("--prompt", type=str, required=True, help="Prompt name")
+    run.add_argument("--input", type=str, required=True, help="Input text or path to file")
+    run.add_argument("--chunked", action="store_true", help="Treat --input as a long document: chunk, map concurrently, reduce")
+
+    batch = sub.add_parser("batch", parents=[run_flags], help="Score a prompt against a JSONL dataset")
+    batch.add_argument("--prompt", type=str, required=True, help="Prompt name")
+    batch.add_argument("--dataset", type=str, required=True, help="JSONL file of inputs")
+    batch.add_argument("--concurrency", type=int, default=4, help="Max in-flight inputs")
+
+    sub.add_parser("bench", help="Offline benchmark suite; remaining arguments go to benchmarks.run")
+
+    export = sub.add_parser("export", help="Export scored results from the results store")
+    export.add_argument("--db", type=str, default="results/results.sqlite3", help="Results store path")
+    export.add_argument("--prompt", type=str, help="Only this prompt")
+    export.add_argument("--version", type=int, help="Only this prompt version")
+    export.add_argument("--model", type=str, help="Only rows for this student model")
+    export.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", help="Output format")
+    export.add_argument("--output", "-o", type=str, help="Output file (default: stdout)")
+
+    stats = sub.add_parser("stats", help="Per-version score distributions, criteria and token usage")
+    stats.add_argument("--prompt", type=str, required=True, help="Prompt name")
+    stats.add_argument("--db", type=str, default="results/results.sqlite3", help="Results store path")
+    stats.add_argument("--model", type=str, help="Only rows for this student model")
+    stats.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+
+    submit = sub.add_parser("submit", help="Queue scoring / optimization jobs for workers")
+    submit.add_argument("--prompt", type=str, required=True, help="Prompt name")
+    submit.add_argument("--dataset", type=str, help="JSONL inputs to score (one job per line)")
+    submit.add_argument("--input", type=str, help="Input text or file for optimization rounds")
+    submit.add_argument("--rounds", type=int, default=0, help="Number of optimization rounds to chain")
+    submit.add_argument("--run-id", type=str, help="Resume/extend an existing run")
+    submit.add_argument("--queue", type=str, default="jobs/jobs.sqlite3", help="Job queue path")
+
+    worker = sub.add_parser("worker", parents=[run_flags], help="Run worker processes that execute queued jobs")
+    worker.add_argument("-n", "--processes", type=int, default=1, help="Worker processes")
+    worker.add_argument("--concurrency", type=int, default=1, help="Concurrent jobs per process")
+    worker.add_argument("--queue", type=str, default="jobs/jobs.sqlite3", help="Job queue path")
+    worker.add_argument("--exit-when-idle", action="store_true", help="Stop once no jobs are queued or running")
+
+    jobs = sub.add_parser("jobs", help="Job counts per status")
+    jobs.add_argument("--run-id", type=str, help="Only this run")
+    jobs.add_argument("--queue", type=str, default="jobs/jobs.sqlite3", help="Job queue path")
+    jobs.add_argument("--retry-failed", action="store_true", help="Re-queue failed jobs")
+
+    args, extra = parser.parse_known_args(argv)
+    if args.command == "bench":
+        raise SystemExit(run_bench(extra))
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    if args.command == "export":
+        count = export_results(args.db, args.output, args.prompt, version=args.version, model=args.model, fmt=args.format)
+        print(f"Exported {count} rows", file=sys.stderr)
+        return
+    if args.command == "stats":
+        print_stats(args.db, args.prompt, model=args.model, as_json=args.json)
+        return
+    if args.command == "submit":
+        input_text = _read_input(args.input) if args.input is not None else None
+        submit_jobs(args.queue, args.prompt, run_id=args.run_id, dataset=args.dataset, input_text=input_text, rounds=args.rounds)
+        return
+    if args.command == "jobs":
+        print_jobs(args.queue, args.run_id, args.retry_failed)
+        return
+    if args.command == "worker":
+        run_workers(run_config(args), args.queue, args.processes, args.concurrency, args.exit_when_idle)
+        return
 
-    args = parser.parse_args()
     if args.init:
         cfg = interactive_config_prompt()
         print("Config collected. Run with --prompt and --input to execute an iteration.")
         return
 
+    import asyncio
+
+    if args.command == "batch" or (args.command is None and args.prompt and args.dataset):
+        asyncio.run(run_dataset(run_config(args), args.prompt, args.dataset, args.concurrency))
+        return
+
     if not args.prompt or not args.input:
         parser.print_help()
         return
 
-    input_text = args.input
-    p = Path(input_text)
-    if p.exists():
-        input_text = p.read_text(encoding="utf-8")
-
-    cfg = interactive_config_prompt()
-    asyncio.run(run_once(cfg, args.prompt, input_text))
+    if args.chunked:
+        if not Path(args.input).exists():
+            raise SystemExit(f"--chunked needs --input to be a file: {args.input}")
+        asyncio.run(run_chunked(run_config(args), args.prompt, args.input))
+        return
+    asyncio.run(run_once(run_config(args), args.prompt, _read_input(args.input)))
 
 
 if __name__ == "__main__":
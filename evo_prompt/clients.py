@@ -1,13 +1,127 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import asyncio
+import importlib.util
 import json
+import threading
+import time
 
 import httpx
 
+from .ratelimit import RateLimiter, parse_retry_after
+from .metrics import Metrics
+
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def merge_usage(usages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum numeric token counters across several responses."""
+    out: Dict[str, Any] = {}
+    for usage in usages:
+        for k, v in (usage or {}).items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                out[k] = out.get(k, 0) + v
+    return out
+
+
+def parse_choices(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-choice ``{"index", "text", "finish_reason", "logprobs"}`` from a completions response."""
+    choices = []
+    for i, c in enumerate(data.get("choices") or []):
+        msg = c.get("message") or {}
+        choices.append({
+            "index": c.get("index", i),
+            "text": msg.get("content") or c.get("text") or "",
+            "finish_reason": c.get("finish_reason"),
+            "logprobs": c.get("logprobs"),
+        })
+    choices.sort(key=lambda c: c["index"])
+    return choices
+
+
+class ConnectionPool:
+    """Process-wide ``httpx.AsyncClient`` per origin, shared by model clients.
+
+    Clients pointing at the same scheme/host/port (e.g. student and teacher
+    on one provider) reuse warm keep-alive/TLS connections. An
+    ``httpx.AsyncClient`` is bound to the event loop it runs on, so entries
+    are also keyed by loop; entries of closed loops are dropped. HTTP/2 is
+    negotiated when the optional ``h2`` package is installed.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool | None = None,
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = importlib.util.find_spec("h2") is not None if http2 is None else http2
+        self._lock = threading.Lock()
+        # (origin, id(loop)) -> [loop, client, refs]
+        self._entries: Dict[Tuple[str, int], List[Any]] = {}
+
+    @staticmethod
+    def _origin(base_url: str) -> str:
+        url = httpx.URL(base_url)
+        return f"{url.scheme}://{url.host}:{url.port or ''}"
+
+    def acquire(self, base_url: str) -> httpx.AsyncClient:
+        """Shared client for ``base_url`` on the running loop; pair with ``release``."""
+        loop = asyncio.get_running_loop()
+        key = (self._origin(base_url), id(loop))
+        with self._lock:
+            for k in [k for k, e in self._entries.items() if e[0].is_closed()]:
+                del self._entries[k]
+            entry = self._entries.get(key)
+            if entry is None or entry[1].is_closed:
+                client = httpx.AsyncClient(limits=self.limits, http2=self.http2)
+                entry = self._entries[key] = [loop, client, 0]
+            entry[2] += 1
+            return entry[1]
+
+    async def release(self, base_url: str, client: httpx.AsyncClient) -> None:
+        """Drop one reference; the last one closes the shared connections."""
+        key = (self._origin(base_url), id(asyncio.get_running_loop()))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] is not client:
+                return
+            entry[2] -= 1
+            if entry[2] > 0:
+                return
+            del self._entries[key]
+        await client.aclose()
+
+    async def aclose(self) -> None:
+        """Close every shared client on the running loop regardless of references."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            mine = [k for k, e in self._entries.items() if e[0] is loop]
+            clients = [self._entries.pop(k)[1] for k in mine]
+        for client in clients:
+            await client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": len(self._entries),
+                "references": sum(e[2] for e in self._entries.values()),
+                "http2": self.http2,
+            }
+
+
+DEFAULT_POOL = ConnectionPool()
+
 
 class ModelClient(ABC):
     """Abstract model client interface."""
@@ -20,10 +134,92 @@ class ModelClient(ABC):
         { "text": str, "raw": dict, "usage": dict }
         """
 
+    async def generate_many(self, prompt: str, n: int = 1, **kwargs: Any) -> Dict[str, Any]:
+        """Sample ``n`` completions of one prompt.
+
+        Returns the standard dict with ``"text"`` set to the first choice and
+        ``"choices"``: a list of ``{"index", "text", "finish_reason",
+        "logprobs"}``. Clients without native ``n`` support make ``n`` calls.
+        """
+        resps = await asyncio.gather(*(self.generate(prompt, **kwargs) for _ in range(max(1, n))))
+        choices = [
+            {"index": i, "text": r.get("text", ""), "finish_reason": None, "logprobs": None}
+            for i, r in enumerate(resps)
+        ]
+        return {
+            "text": choices[0]["text"],
+            "choices": choices,
+            "raw": {"calls": [r.get("raw", {}) for r in resps]},
+            "usage": merge_usage([r.get("usage", {}) for r in resps]),
+        }
+
+    async def stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Yield incremental chunks ``{"text": str, "raw": dict}``.
+
+        Clients without native streaming yield the full generation once.
+        """
+        resp = await self.generate(prompt, **kwargs)
+        yield {"text": resp.get("text", ""), "raw": resp.get("raw", {}), "usage": resp.get("usage", {})}
+
+    async def generate_stream(self, prompt: str, stop_when: Callable[[str], bool] | None = None, **kwargs: Any) -> Dict[str, Any]:
+        """Consume ``stream()`` into the standard return shape.
+
+        ``stop_when`` is called with the accumulated text after each chunk;
+        returning True closes the stream early. Timing is reported under
+        ``"stream"``: ``ttft`` (time to first token), ``duration``,
+        ``completion_tokens``, ``tokens_per_second`` and ``early_stopped``.
+        """
+        start = time.perf_counter()
+        first = None
+        text = ""
+        chunks = 0
+        usage: Dict[str, Any] = {}
+        stopped = False
+        agen = self.stream(prompt, **kwargs)
+        try:
+            async for chunk in agen:
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                delta = chunk.get("text") or ""
+                if not delta:
+                    continue
+                if first is None:
+                    first = time.perf_counter()
+                text += delta
+                chunks += 1
+                if stop_when and stop_when(text):
+                    stopped = True
+                    break
+        finally:
+            await agen.aclose()
+        end = time.perf_counter()
+
+        # servers usually send one token per delta when usage is not reported
+        completion_tokens = usage.get("completion_tokens") or chunks
+        gen_time = end - first if first is not None else 0.0
+        stats = {
+            "ttft": first - start if first is not None else None,
+            "duration": end - start,
+            "completion_tokens": completion_tokens,
+            "tokens_per_second": completion_tokens / gen_time if gen_time > 0 else None,
+            "early_stopped": stopped,
+        }
+        return {"text": text, "raw": {"streamed": True}, "usage": usage, "stream": stats}
+
     @abstractmethod
     def close(self) -> None:
         """Cleanup resources if needed."""
 
+    async def aclose(self) -> None:
+        """Async cleanup; prefer this (or ``async with``) inside an event loop."""
+        self.close()
+
+    async def __aenter__(self) -> "ModelClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.aclose()
+
 
 @dataclass
 class OpenAICompatibleClient(ModelClient):
@@ -31,12 +227,79 @@ class OpenAICompatibleClient(ModelClient):
     base_url: Optional[str] = None
     model: str = "gpt-4"
     timeout: int = 60
+    # request pacing; pass a shared ``limiter`` when clients share one quota
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    max_concurrency: int = 16
+    max_retries: int = 4
+    limiter: Optional[RateLimiter] = None
+    metrics: Optional[Metrics] = None
+    # custom httpx transport, e.g. httpx.MockTransport for offline runs; bypasses the pool
+    transport: Optional[httpx.AsyncBaseTransport] = None
+    # shared connections; defaults to the process-wide DEFAULT_POOL
+    pool: Optional[ConnectionPool] = None
 
     def __post_init__(self) -> None:
-        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        self._client = httpx.AsyncClient(timeout=self.timeout, headers=headers)
+        self._headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
         # default to OpenAI API base if not provided
         self.base_url = self.base_url or "https://api.openai.com/v1"
+        self.pool = self.pool or DEFAULT_POOL
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing: set = set()
+        if self.limiter is None:
+            self.limiter = RateLimiter(rpm=self.rpm, tpm=self.tpm, max_concurrency=self.max_concurrency, max_retries=self.max_retries)
+
+    def _http(self) -> httpx.AsyncClient:
+        """HTTP client for the running loop, acquired lazily from the pool."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop or self._client.is_closed:
+            if self.transport is not None:
+                self._client = httpx.AsyncClient(transport=self.transport)
+            else:
+                self._client = self.pool.acquire(self.base_url)
+            self._client_loop = loop
+        return self._client
+
+    async def _send(self, url: str, payload: Dict[str, Any], est_tokens: float, stream: bool = False) -> httpx.Response:
+        """POST with pacing and retries on 429/5xx/transport errors.
+
+        With ``stream=True`` the body is left unread and the caller must close
+        the response; retries only happen before the first byte.
+        """
+        limiter = self.limiter
+        attempt = 0
+        while True:
+            retry_after = None
+            async with limiter.slot(est_tokens):
+                try:
+                    client = self._http()
+                    request = client.build_request("POST", url, json=payload, headers=self._headers, timeout=self.timeout)
+                    resp = await client.send(request, stream=stream)
+                except httpx.TransportError:
+                    limiter.on_error(transport=True)
+                    if attempt >= limiter.max_retries:
+                        raise
+                    resp = None
+            if resp is not None:
+                if resp.status_code < 400:
+                    limiter.on_success()
+                    return resp
+                if stream:
+                    await resp.aread()
+                    await resp.aclose()
+                if resp.status_code not in RETRYABLE_STATUS or attempt >= limiter.max_retries:
+                    resp.raise_for_status()
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                if resp.status_code == 429:
+                    limiter.on_throttle(retry_after)
+                else:
+                    limiter.on_error()
+            if self.metrics is not None:
+                reason = "transport" if resp is None else str(resp.status_code)
+                self.metrics.inc("evo_retries_total", model=self.model, reason=reason)
+            await limiter.backoff(attempt, retry_after)
+            attempt += 1
 
     async def generate(self, prompt: str, temperature: float = 0.0, max_tokens: int = 512, **kwargs: Any) -> Dict[str, Any]:
         # Use chat completions if available
@@ -50,46 +313,110 @@ class OpenAICompatibleClient(ModelClient):
         # merge any additional kwargs into payload
         payload.update(kwargs)
 
-        resp = await self._client.post(url, json=payload)
-        resp.raise_for_status()
+        # rough token estimate for the TPM bucket; corrected from usage below
+        est_tokens = len(prompt) / 4 + max_tokens * max(1, int(payload.get("n") or 1))
+        resp = await self._send(url, payload, est_tokens)
         data = resp.json()
 
-        # Normalize output
-        text = ""
-        try:
-            # chat completions shape
-            choices = data.get("choices", [])
-            if choices:
-                # join assistant content if multiple
-                parts = []
-                for c in choices:
-                    msg = c.get("message") or {}
-                    content = msg.get("content") or c.get("text")
-                    if content:
-                        parts.append(content)
-                text = "\n".join(parts)
-        except Exception:
-            text = data.get("text") or ""
+        # Normalize output; "text" is the first choice, all of them are under "choices"
+        choices = parse_choices(data)
+        text = choices[0]["text"] if choices else (data.get("text") or "")
 
         usage = data.get("usage", {})
-        return {"text": text, "raw": data, "usage": usage}
+        self.limiter.record_tokens(est_tokens, usage.get("total_tokens") or 0)
+        out = {"text": text, "raw": data, "usage": usage}
+        if len(choices) > 1:
+            out["choices"] = choices
+        return out
+
+    async def generate_many(self, prompt: str, n: int = 1, **kwargs: Any) -> Dict[str, Any]:
+        """One request with the API's ``n`` parameter; the prompt is sent (and billed) once.
+
+        Servers that ignore ``n`` are topped up with single calls.
+        """
+        n = max(1, n)
+        resp = await self.generate(prompt, n=n, **kwargs)
+        choices = resp.get("choices") or parse_choices(resp.get("raw", {})) or [{"index": 0, "text": resp["text"], "finish_reason": None, "logprobs": None}]
+        if len(choices) < n:
+            extra = await ModelClient.generate_many(self, prompt, n=n - len(choices), **kwargs)
+            for c in extra["choices"]:
+                choices.append(dict(c, index=len(choices)))
+            resp["usage"] = merge_usage([resp.get("usage", {}), extra["usage"]])
+        resp["choices"] = choices[:n]
+        return resp
+
+    async def stream(self, prompt: str, temperature: float = 0.0, max_tokens: int = 512, **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a chat completion, parsing server-sent events.
+
+        Closing the iterator early closes the HTTP response, which stops the
+        server from generating further tokens.
+        """
+        url = f"{self.base_url}/chat/completions"
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        payload.update(kwargs)
+
+        est_tokens = len(prompt) / 4 + max_tokens
+        resp = await self._send(url, payload, est_tokens, stream=True)
+        usage: Dict[str, Any] = {}
+        try:
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    continue
+                usage = chunk.get("usage") or usage
+                text = ""
+                for c in chunk.get("choices") or []:
+                    delta = c.get("delta") or {}
+                    text += delta.get("content") or c.get("text") or ""
+                yield {"text": text, "raw": chunk, "usage": chunk.get("usage") or {}}
+        finally:
+            await resp.aclose()
+            self.limiter.record_tokens(est_tokens, usage.get("total_tokens") or 0)
+
+    async def aclose(self) -> None:
+        """Release the pooled connection (or close a private transport client)."""
+        client, self._client = self._client, None
+        if client is None:
+            return
+        if self._client_loop is not asyncio.get_running_loop():
+            # bound to another (finished) loop; its sockets went with it
+            return
+        if self.transport is not None:
+            await client.aclose()
+        else:
+            await self.pool.release(self.base_url, client)
 
     def close(self) -> None:
-        # Synchronous wrapper that schedules an async close safely.
+        """Synchronous close: schedules ``aclose`` when a loop is running.
+
+        Prefer ``await client.aclose()`` or ``async with client:`` so the
+        release completes before the loop shuts down.
+        """
         try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # schedule async close without awaiting (best-effort)
-                loop.create_task(self._client.aclose())
-            else:
-                loop.run_until_complete(self._client.aclose())
+            loop = asyncio.get_running_loop()
         except RuntimeError:
-            # No running loop; create a new one to close
-            try:
-                asyncio.run(self._client.aclose())
-            except Exception:
-                pass
-        except Exception:
-            pass
+            loop = None
+        if loop is None:
+            if self._client_loop is not None and not self._client_loop.is_closed() and self._client is not None:
+                self._client_loop.run_until_complete(self.aclose())
+            else:
+                self._client = None
+            return
+        task = loop.create_task(self.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
 
 
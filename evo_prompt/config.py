@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Mapping, Optional
 import json
+import os
 import getpass
 
 
@@ -17,10 +18,50 @@ class Config:
     teacher_base_url: Optional[str] = None
     teacher_model: str = "gpt-4"
 
+    # extra interchangeable endpoints, e.g. [{"base_url": ..., "api_key": ..., "model": ...}];
+    # when set, requests are routed to the fastest healthy one and hedged on slow tails
+    student_backends: Optional[List[Dict[str, Any]]] = None
+    teacher_backends: Optional[List[Dict[str, Any]]] = None
+    hedge_budget: float = 0.1
+
     prompts_dir: str = "prompts"
     logs_dir: str = "logs"
     results_dir: str = "results"
 
+    cache_backend: str = "file"  # "file" or "sqlite"
+    cache_dir: str = ".cache"  # teacher verdicts go to <cache_dir>/evaluations
+    cache_ttl_seconds: int = 3600
+    cache_max_entries: Optional[int] = None
+    # teacher verdicts are stable for longer than student generations; always SQLite so the cap applies
+    eval_cache_ttl_seconds: int = 7 * 24 * 3600
+    eval_cache_max_entries: Optional[int] = 100000
+    # near-duplicate tier: serve deterministic student calls from a cached prompt whose
+    # character-shingle similarity is at least this (None disables); optionally evaluations too
+    similarity_threshold: Optional[float] = None
+    similarity_for_evaluations: bool = False
+
+    # local checks run before the teacher (empty output is always rejected)
+    output_max_chars: Optional[int] = None
+    output_regex: Optional[str] = None
+    output_json_schema: Optional[str] = None  # path to a JSON Schema file
+    prescorer_weight: float = 0.2  # share of the mean local check score in the final score
+
+    # long inputs with --chunked: token-budgeted chunks (with overlap) mapped concurrently, then reduced
+    chunk_tokens: int = 2000
+    chunk_overlap_tokens: int = 200
+    chunk_concurrency: int = 4
+
+    # shared HTTP connection pool (one per origin, so student and teacher on one provider share it)
+    http_max_connections: int = 100
+    http_max_keepalive: int = 20
+    http_keepalive_expiry: float = 30.0
+
+    metrics_file: Optional[str] = None  # Prometheus text file written after each CLI run
+
+    # record/replay of model calls: None, "strict", "record" or "passthrough"
+    replay_mode: Optional[str] = None
+    cassette_dir: str = "cassettes"
+
     temperature: float = 0.0
     max_tokens: int = 512
 
@@ -33,6 +74,70 @@ def load_config(path: Path | str) -> Config:
     return Config(**data)
 
 
+ENV_PREFIX = "EVO_"
+DEFAULT_CONFIG_FILE = "config.json"
+# the demo scripts' variables, used when the EVO_* ones are not set
+_ENV_ALIASES = {
+    "DEEPSEEK_API_KEY": ("student_api_key", "teacher_api_key"),
+    "DEEPSEEK_BASE_URL": ("student_base_url", "teacher_base_url"),
+    "DEEPSEEK_MODEL": ("student_model", "teacher_model"),
+}
+
+
+def _coerce(kind: str, raw: str) -> Any:
+    if raw == "" and kind.startswith("Optional"):
+        return None
+    if "bool" in kind:
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    if "List" in kind or "Dict" in kind:
+        return json.loads(raw)
+    if "int" in kind:
+        return int(raw)
+    if "float" in kind:
+        return float(raw)
+    return raw
+
+
+def config_from_env(env: Mapping[str, str] | None = None) -> Dict[str, Any]:
+    """Config fields set through ``EVO_<FIELD>`` variables (e.g. ``EVO_STUDENT_API_KEY``)."""
+    env = os.environ if env is None else env
+    out: Dict[str, Any] = {}
+    for alias, names in _ENV_ALIASES.items():
+        if env.get(alias):
+            out.update({name: env[alias] for name in names})
+    for f in fields(Config):
+        raw = env.get(ENV_PREFIX + f.name.upper())
+        if raw is not None:
+            try:
+                out[f.name] = _coerce(str(f.type), raw)
+            except ValueError as e:
+                raise ValueError(f"Invalid value for {ENV_PREFIX + f.name.upper()}: {raw!r}") from e
+    return out
+
+
+def resolve_config(
+    path: Path | str | None = None,
+    overrides: Mapping[str, Any] | None = None,
+    env: Mapping[str, str] | None = None,
+) -> Config:
+    """Non-interactive config: defaults < config file < environment < ``overrides`` (CLI flags).
+
+    The file is ``path``, else ``$EVO_CONFIG``, else ``config.json`` if it
+    exists. ``None`` values in ``overrides`` are ignored.
+    """
+    env = os.environ if env is None else env
+    data: Dict[str, Any] = {}
+    if path is None:
+        path = env.get(ENV_PREFIX + "CONFIG") or (DEFAULT_CONFIG_FILE if Path(DEFAULT_CONFIG_FILE).exists() else None)
+    if path is not None:
+        if not Path(path).exists():
+            raise FileNotFoundError(f"Config file not found: {path}")
+        data.update(json.loads(Path(path).read_text(encoding="utf-8")))
+    data.update(config_from_env(env))
+    data.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    return Config(**data)
+
+
 def interactive_config_prompt() -> Config:
     print("Interactive config setup — enter API keys and preferences.\nPress Enter to skip a value.")
     student_api_key = input("Student (DeepSeek) API key: ") or None
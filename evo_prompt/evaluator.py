@@ -1,8 +1,74 @@
 from __future__ import annotations
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Sequence
 from .clients import ModelClient
+from .cache import Cache, InflightRequests, cache_key
+from .metrics import Metrics
+from .prescorers import PreScorer, run_prescorers, weighted_score
+from .tokens import estimate_tokens
+import asyncio
+import hashlib
 import json
+import logging
+
+
+EVALUATOR_PREAMBLE = (
+    "You are an expert evaluator. Given the student's output and the original instruction, return a JSON object"
+    " with keys: score (0-100), criteria (a dict of criterion name to a 0-100 score, e.g. relevance, correctness,"
+    " conciseness), feedback (string), suggested_prompt (optional string).\n"
+)
+
+BATCH_EVALUATOR_PREAMBLE = (
+    "You are an expert evaluator. Given the original instruction and {n} numbered student outputs, return a JSON"
+    " array with exactly one object per output, in order. Each object has keys: index (the output number),"
+    " score (0-100), criteria (a dict of criterion name to a 0-100 score), feedback (string),"
+    " suggested_prompt (optional string).\n"
+)
+
+
+# bump when the preambles change so cached evaluations from the old wording are not reused
+TEMPLATE_VERSION = hashlib.sha256((EVALUATOR_PREAMBLE + BATCH_EVALUATOR_PREAMBLE).encode("utf-8")).hexdigest()[:16]
+
+
+def json_object_complete(text: str) -> bool:
+    """True once ``text`` contains a balanced top-level JSON object.
+
+    Used as an early-stop predicate when streaming the teacher's reply.
+    """
+    start = text.find("{")
+    if start < 0:
+        return False
+    depth = 0
+    in_string = False
+    escaped = False
+    for ch in text[start:]:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return True
+    return False
+
+
+def _parse_json_array(text: str) -> List[Any]:
+    try:
+        parsed = json.loads(text)
+    except Exception:
+        try:
+            parsed, _ = json.JSONDecoder().raw_decode(text[text.index("["):])
+        except Exception:
+            return []
+    return parsed if isinstance(parsed, list) else []
 
 
 class Evaluator:
@@ -13,22 +79,158 @@ class Evaluator:
     - criteria: dict of criterion->score
     - feedback: textual feedback
     - suggested_prompt: optional improved prompt text
+
+    Optional ``prescorers`` run first; a hard failure rejects the output
+    locally (score 0) without a teacher call. Local scores are merged into
+    ``criteria``. The score is the ``criteria_weights`` weighted mean of the
+    criteria present (the teacher's own score when none are); local scores
+    not named in ``criteria_weights`` are then blended in with
+    ``prescorer_weight``.
     """
 
-    def __init__(self, teacher_client: ModelClient, criteria_weights: Dict[str, float] | None = None) -> None:
+    def __init__(
+        self,
+        teacher_client: ModelClient,
+        criteria_weights: Dict[str, float] | None = None,
+        inflight: InflightRequests | None = None,
+        stream: bool = False,
+        metrics: Metrics | None = None,
+        cache: Cache | None = None,
+        prescorers: Sequence[PreScorer] | None = None,
+        allow_similar: bool = False,
+        prescorer_weight: float = 0.2,
+    ) -> None:
         self.teacher = teacher_client
         self.criteria_weights = criteria_weights or {"relevance": 0.4, "correctness": 0.4, "conciseness": 0.2}
+        self.inflight = inflight or InflightRequests()
+        # stream the teacher reply and stop as soon as the JSON object closes
+        self.stream = stream
+        self.metrics = metrics
+        # memoizes finished evaluations; TTL/eviction come from the cache backend
+        self.cache = cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # reuse the verdict for a near-identical output (needs a SimilarityCache)
+        self.allow_similar = allow_similar
+        self.prescorers = list(prescorers or [])
+        self.prescorer_weight = prescorer_weight
+        self.rejected = 0
+
+    @property
+    def teacher_model(self) -> str:
+        return getattr(self.teacher, "model", "unknown")
+
+    def _cache_params(self, instruction: str | None) -> Dict[str, Any]:
+        return {
+            "kind": "evaluation",
+            "instruction": instruction or "",
+            "template": TEMPLATE_VERSION,
+            "weights": self.criteria_weights,
+        }
+
+    def cached(self, student_output: str, instruction: str | None = None) -> Dict[str, Any] | None:
+        """Previously stored evaluation of ``student_output`` for ``instruction``, if any."""
+        if self.cache is None:
+            return None
+        params = self._cache_params(instruction)
+        hit = self.cache.get(student_output, self.teacher_model, params)
+        reason = "eval_cache"
+        if hit is None and self.allow_similar and hasattr(self.cache, "get_similar"):
+            similar = self.cache.get_similar(student_output, self.teacher_model, params)
+            if similar is not None:
+                hit = dict(similar[0], similarity=similar[1])
+                reason = "eval_cache_similar"
+        if hit is None:
+            self.cache_misses += 1
+            return None
+        self.cache_hits += 1
+        if self.metrics is not None:
+            self.metrics.inc("evo_teacher_calls_avoided_total", model=self.teacher_model, reason=reason)
+        return hit
+
+    def _store(self, student_output: str, instruction: str | None, result: Dict[str, Any]) -> None:
+        if self.cache is not None:
+            self.cache.set(student_output, self.teacher_model, self._cache_params(instruction), result)
+
+    def cache_stats(self) -> Dict[str, int]:
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "prescreen_rejected": self.rejected}
+
+    def _rejection(self, local: List[Dict[str, Any]]) -> Dict[str, Any] | None:
+        """Evaluation result for a hard prescorer failure, or None if the output may go to the teacher."""
+        failed = [r for r, s in zip(local, self.prescorers) if s.hard and not r["passed"]]
+        if not failed:
+            return None
+        self.rejected += 1
+        if self.metrics is not None:
+            self.metrics.inc("evo_teacher_calls_avoided_total", model=self.teacher_model, reason="prescreen")
+        return {
+            "score": 0,
+            "criteria": {r["name"]: r["score"] for r in local},
+            "feedback": "; ".join(r["reason"] for r in failed),
+            "suggested_prompt": None,
+            "raw": {"prescreen": local},
+        }
+
+    def _combine(self, teacher_result: Dict[str, Any], local: List[Dict[str, Any]]) -> Dict[str, Any]:
+        criteria = teacher_result.get("criteria")
+        criteria = dict(criteria) if isinstance(criteria, dict) else {}
+        criteria.update({r["name"]: r["score"] for r in local})
+        out = dict(teacher_result)
+        out["criteria"] = criteria
+        out["teacher_score"] = teacher_result.get("score")
+        score = weighted_score(criteria, self.criteria_weights, fallback=teacher_result.get("score", 0))
+        unweighted = [r["score"] for r in local if r["name"] not in self.criteria_weights]
+        if unweighted and self.prescorer_weight > 0 and isinstance(score, (int, float)):
+            w = min(1.0, self.prescorer_weight)
+            score = (1 - w) * score + w * sum(unweighted) / len(unweighted)
+        out["score"] = score
+        return out
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.close()
+
+    async def _ask_teacher(self, prompt: str, max_tokens: int = 512) -> Dict[str, Any]:
+        params = {"temperature": 0.0, "max_tokens": max_tokens}
+        model = self.teacher_model
+        key = cache_key(prompt, model, params)
+
+        async def call() -> Dict[str, Any]:
+            if self.stream:
+                resp = await self.teacher.generate_stream(prompt, stop_when=json_object_complete, **params)
+            else:
+                resp = await self.teacher.generate(prompt, **params)
+            if self.metrics is not None:
+                self.metrics.record_usage(model, resp.get("usage"), role="teacher")
+            return resp
+
+        return await self.inflight.run(key, call)
+
+    @staticmethod
+    def _normalize(parsed: Dict[str, Any], raw: Dict[str, Any]) -> Dict[str, Any]:
+        score = parsed.get("score", 0)
+        criteria = parsed.get("criteria", {})
+        feedback = parsed.get("feedback", "")
+        suggested = parsed.get("suggested_prompt")
+        return {"score": score, "criteria": criteria, "feedback": feedback, "suggested_prompt": suggested, "raw": raw}
 
     async def evaluate(self, student_output: str, instruction: str | None = None) -> Dict[str, Any]:
-        prompt = (
-            "You are an expert evaluator. Given the student's output and the original instruction, return a JSON object"
-            " with keys: score (0-100), criteria (a dict), feedback (string), suggested_prompt (optional string).\n"
-        )
+        local = run_prescorers(self.prescorers, student_output, instruction)
+        rejected = self._rejection(local)
+        if rejected is not None:
+            return rejected
+        result = self.cached(student_output, instruction)
+        if result is None:
+            result = await self._evaluate_uncached(student_output, instruction)
+        return self._combine(result, local)
+
+    async def _evaluate_uncached(self, student_output: str, instruction: str | None = None) -> Dict[str, Any]:
+        prompt = EVALUATOR_PREAMBLE
         if instruction:
             prompt += f"Instruction:\n{instruction}\n\n"
         prompt += f"Student Output:\n{student_output}\n\nRespond only with JSON."
 
-        resp = await self.teacher.generate(prompt, temperature=0.0, max_tokens=512)
+        resp = await self._ask_teacher(prompt)
         raw = resp.get("raw", {})
         text = resp.get("text", "")
 
@@ -40,16 +242,103 @@ class Evaluator:
             # fallback: try to find first JSON-like block
             try:
                 start = text.index("{")
-                parsed = json.loads(text[start:])
+                parsed, _ = json.JSONDecoder().raw_decode(text[start:])
             except Exception:
-                parsed = {"score": 0, "criteria": {}, "feedback": text, "suggested_prompt": None}
+                parsed = None
 
-        # normalize
-        score = parsed.get("score", 0)
-        criteria = parsed.get("criteria", {})
-        feedback = parsed.get("feedback", "")
-        suggested = parsed.get("suggested_prompt")
+        if not isinstance(parsed, dict):
+            # unparseable replies are not cached so the next run asks again
+            return self._normalize({"score": 0, "criteria": {}, "feedback": text, "suggested_prompt": None}, raw)
+        result = self._normalize(parsed, raw)
+        self._store(student_output, instruction, result)
+        return result
 
-        return {"score": score, "criteria": criteria, "feedback": feedback, "suggested_prompt": suggested, "raw": raw}
+    async def evaluate_many(
+        self,
+        outputs: Sequence[str],
+        instruction: str | None = None,
+        max_tokens: int = 2048,
+        tokens_per_item: int = 256,
+        context_tokens: int = 8192,
+        fallback_concurrency: int = 4,
+    ) -> List[Dict[str, Any]]:
+        """Judge many outputs for the same instruction with few teacher calls.
+
+        Outputs are packed greedily: a request grows while the estimated
+        tokens of the preamble, the instruction and the packed outputs, plus
+        ``tokens_per_item`` of reply per output, fit in ``context_tokens`` and
+        the replies fit in ``max_tokens``. The teacher answers with a JSON
+        array. Items missing from the reply or without a numeric score
+        (including every item of a failed batch call) are re-judged one by
+        one, at most ``fallback_concurrency`` at a time so an outage or 429
+        does not turn into a burst of single calls.
+        Outputs rejected by the prescorers or already in the evaluation cache
+        are not sent at all.
+        Results are returned in input order.
+        """
+        outputs = list(outputs)
+        local = [run_prescorers(self.prescorers, o, instruction) for o in outputs]
+        rejected = [self._rejection(lc) for lc in local]
+        results: List[Dict[str, Any] | None] = [None if r is not None else self.cached(o, instruction) for o, r in zip(outputs, rejected)]
+        pending = [i for i, r in enumerate(results) if r is None and rejected[i] is None]
+        per_reply = max(1, tokens_per_item)
+        max_items = max(1, max_tokens // per_reply)
+        overhead = estimate_tokens(BATCH_EVALUATOR_PREAMBLE + (instruction or "")) + 32
+        batches: List[List[int]] = []
+        used = 0
+        for i in pending:
+            cost = estimate_tokens(outputs[i]) + 8 + per_reply
+            if batches and len(batches[-1]) < max_items and used + cost <= context_tokens:
+                batches[-1].append(i)
+                used += cost
+            else:
+                batches.append([i])
+                used = overhead + cost
+
+        async def judge(indices: List[int]) -> None:
+            if len(indices) == 1:
+                results[indices[0]] = await self._evaluate_uncached(outputs[indices[0]], instruction)
+                return
+            prompt = BATCH_EVALUATOR_PREAMBLE.format(n=len(indices))
+            if instruction:
+                prompt += f"Instruction:\n{instruction}\n\n"
+            for pos, idx in enumerate(indices, 1):
+                prompt += f"Student Output {pos}:\n{outputs[idx]}\n\n"
+            prompt += "Respond only with a JSON array."
+            try:
+                resp = await self._ask_teacher(prompt, max_tokens=min(max_tokens, per_reply * len(indices)))
+            except Exception as exc:
+                logging.getLogger(__name__).warning("Batch evaluation of %d outputs failed: %r", len(indices), exc)
+                if self.metrics is not None:
+                    self.metrics.inc("evo_teacher_batch_failures_total", model=self.teacher_model)
+                return
+            for pos, item in enumerate(_parse_json_array(resp.get("text", "")), 1):
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    pos = int(item.get("index", pos))
+                    float(item["score"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if 1 <= pos <= len(indices) and results[indices[pos - 1]] is None:
+                    idx = indices[pos - 1]
+                    results[idx] = self._normalize(item, resp.get("raw", {}))
+                    self._store(outputs[idx], instruction, results[idx])
+
+        await asyncio.gather(*(judge(b) for b in batches))
+
+        # single-call fallback only for the items that did not validate
+        missing = [i for i in pending if results[i] is None]
+        gate = asyncio.Semaphore(max(1, fallback_concurrency))
 
+        async def single(i: int) -> Dict[str, Any]:
+            async with gate:
+                return await self._evaluate_uncached(outputs[i], instruction)
 
+        singles = await asyncio.gather(*(single(i) for i in missing))
+        for i, res in zip(missing, singles):
+            results[i] = res
+        return [
+            rejected[i] if rejected[i] is not None else self._combine(results[i], local[i])  # type: ignore[arg-type]
+            for i in range(len(outputs))
+        ]
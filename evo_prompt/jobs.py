@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import json
+import sqlite3
+import threading
+import time
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedupe_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_run ON jobs(run_id, status);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    run_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (run_id, key)
+);
+"""
+
+STATUSES = ("queued", "leased", "done", "failed")
+
+
+def _row(row: sqlite3.Row | None) -> Dict[str, Any] | None:
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = None if job["result"] is None else json.loads(job["result"])
+    return job
+
+
+class JobQueue:
+    """Durable SQLite job queue with leases, retries and per-run checkpoints.
+
+    ``lease`` atomically claims the oldest ready job for ``lease_seconds``; a
+    worker that dies simply lets its lease expire and the job becomes ready
+    again. ``fail`` re-queues with a delay until ``max_attempts`` is reached.
+    ``dedupe_key`` makes enqueueing idempotent, so re-submitting a run skips
+    work that is already queued or done. Several processes (or hosts on a
+    filesystem with working POSIX locks) may share one queue file.
+    """
+
+    def __init__(self, path: Path | str = "jobs/jobs.sqlite3") -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # autocommit; write transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.executescript(_SCHEMA)
+
+    def _write(self, fn: Any) -> Any:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return out
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        run_id: str = "",
+        dedupe_key: str | None = None,
+        max_attempts: int = 3,
+        delay: float = 0.0,
+    ) -> int:
+        """Add a job; with ``dedupe_key`` an existing job with that key is returned instead."""
+        now = time.time()
+
+        def tx(conn: sqlite3.Connection) -> int:
+            if dedupe_key is not None:
+                row = conn.execute("SELECT id FROM jobs WHERE dedupe_key = ?", (dedupe_key,)).fetchone()
+                if row is not None:
+                    return row["id"]
+            cur = conn.execute(
+                "INSERT INTO jobs(run_id, kind, payload, dedupe_key, max_attempts, available_at, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, kind, json.dumps(payload, ensure_ascii=False), dedupe_key, max_attempts, now + delay, now, now),
+            )
+            return cur.lastrowid
+
+        return self._write(tx)
+
+    def enqueue_many(self, jobs: Iterable[Dict[str, Any]]) -> List[int]:
+        """``enqueue`` for dicts with the same keys, in one transaction."""
+        now = time.time()
+
+        def tx(conn: sqlite3.Connection) -> List[int]:
+            ids = []
+            for job in jobs:
+                key = job.get("dedupe_key")
+                if key is not None:
+                    row = conn.execute("SELECT id FROM jobs WHERE dedupe_key = ?", (key,)).fetchone()
+                    if row is not None:
+                        ids.append(row["id"])
+                        continue
+                cur = conn.execute(
+                    "INSERT INTO jobs(run_id, kind, payload, dedupe_key, max_attempts, available_at, created, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job.get("run_id", ""), job["kind"], json.dumps(job["payload"], ensure_ascii=False), key,
+                     job.get("max_attempts", 3), now + job.get("delay", 0.0), now, now),
+                )
+                ids.append(cur.lastrowid)
+            return ids
+
+        return self._write(tx)
+
+    def lease(self, owner: str, lease_seconds: float = 300.0, kinds: Iterable[str] | None = None) -> Dict[str, Any] | None:
+        """Claim the oldest ready job (queued, or leased with an expired lease and attempts left).
+
+        Expired leases whose attempts are used up are marked failed instead.
+        """
+        now = time.time()
+        kinds = list(kinds or [])
+
+        def tx(conn: sqlite3.Connection) -> Dict[str, Any] | None:
+            # an expired lease on the last attempt means the job keeps killing its worker: give up
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired after ' || attempts || ' attempts', lease_owner = NULL,"
+                " lease_expires = NULL, updated = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            sql = (
+                "SELECT id FROM jobs WHERE ((status = 'queued' AND available_at <= ?)"
+                " OR (status = 'leased' AND lease_expires < ?))"
+            )
+            args: List[Any] = [now, now]
+            if kinds:
+                sql += f" AND kind IN ({','.join('?' * len(kinds))})"
+                args += kinds
+            row = conn.execute(sql + " ORDER BY available_at, id LIMIT 1", args).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated = ?"
+                " WHERE id = ?",
+                (owner, now + lease_seconds, now, row["id"]),
+            )
+            return _row(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+        return self._write(tx)
+
+    def heartbeat(self, job_id: int, owner: str, lease_seconds: float = 300.0) -> bool:
+        """Extend a lease; False if the job is no longer ours (expired and re-leased)."""
+        now = time.time()
+
+        def tx(conn: sqlite3.Connection) -> bool:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now + lease_seconds, now, job_id, owner),
+            )
+            return cur.rowcount == 1
+
+        return self._write(tx)
+
+    def complete(self, job_id: int, owner: str, result: Any = None) -> bool:
+        now = time.time()
+
+        def tx(conn: sqlite3.Connection) -> bool:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_owner = NULL, lease_expires = NULL, updated = ?"
+                " WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (json.dumps(result, ensure_ascii=False, default=str), now, job_id, owner),
+            )
+            return cur.rowcount == 1
+
+        return self._write(tx)
+
+    def fail(self, job_id: int, owner: str, error: str, retry_delay: float = 5.0) -> str | None:
+        """Record a failure; re-queues after ``retry_delay`` unless attempts are exhausted.
+
+        Returns the new status (``"queued"`` or ``"failed"``), or None if the lease was lost.
+        """
+        now = time.time()
+
+        def tx(conn: sqlite3.Connection) -> str | None:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (job_id, owner),
+            ).fetchone()
+            if row is None:
+                return None
+            status = "queued" if row["attempts"] < row["max_attempts"] else "failed"
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL, updated = ?"
+                " WHERE id = ?",
+                (status, error, now + retry_delay, now, job_id),
+            )
+            return status
+
+        return self._write(tx)
+
+    def retry_failed(self, run_id: str | None = None) -> int:
+        """Put failed jobs back in the queue with a fresh attempt budget."""
+        now = time.time()
+
+        def tx(conn: sqlite3.Connection) -> int:
+            sql = "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, updated = ? WHERE status = 'failed'"
+            args: List[Any] = [now, now]
+            if run_id is not None:
+                sql += " AND run_id = ?"
+                args.append(run_id)
+            return conn.execute(sql, args).rowcount
+
+        return self._write(tx)
+
+    def get(self, job_id: int) -> Dict[str, Any] | None:
+        with self._lock:
+            return _row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def jobs(self, run_id: str | None = None, status: str | None = None, kind: str | None = None) -> List[Dict[str, Any]]:
+        clauses, args = [], []
+        for column, value in (("run_id", run_id), ("status", status), ("kind", kind)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM jobs{where} ORDER BY id", args).fetchall()
+        return [_row(r) for r in rows]  # type: ignore[misc]
+
+    def counts(self, run_id: str | None = None) -> Dict[str, int]:
+        sql = "SELECT status, COUNT(*) AS n FROM jobs"
+        args: List[Any] = []
+        if run_id is not None:
+            sql += " WHERE run_id = ?"
+            args.append(run_id)
+        with self._lock:
+            rows = self._conn.execute(sql + " GROUP BY status", args).fetchall()
+        out = {s: 0 for s in STATUSES}
+        out.update({r["status"]: r["n"] for r in rows})
+        return out
+
+    def pending(self, run_id: str | None = None) -> int:
+        """Jobs that are queued or leased (i.e. not finished)."""
+        c = self.counts(run_id)
+        return c["queued"] + c["leased"]
+
+    def set_checkpoint(self, run_id: str, key: str, value: Any) -> None:
+        now = time.time()
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO checkpoints(run_id, key, value, updated) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(run_id, key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+            (run_id, key, json.dumps(value, ensure_ascii=False, default=str), now),
+        ))
+
+    def get_checkpoint(self, run_id: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM checkpoints WHERE run_id = ? AND key = ?", (run_id, key)).fetchone()
+        return default if row is None else json.loads(row["value"])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,19 +1,35 @@
 from __future__ import annotations
 
 from pathlib import Path
+from collections import deque
 from datetime import datetime
+from typing import Any, Dict
+import atexit
+import gzip
 import json
 import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import weakref
 
 
 def setup_file_logger(log_dir: Path | str = "logs") -> logging.Logger:
+    """Return the run logger for ``log_dir``, creating its handlers only once per process."""
     p = Path(log_dir)
     p.mkdir(parents=True, exist_ok=True)
+
+    logger = logging.getLogger(f"evo_prompt[{p.resolve()}]")
+    if logger.handlers:
+        return logger
+
     ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
     logfile = p / f"{ts}_run.log"
 
-    logger = logging.getLogger(f"evo_prompt_{ts}")
     logger.setLevel(logging.DEBUG)
+    logger.propagate = False
     fh = logging.FileHandler(logfile, encoding="utf-8")
     fh.setLevel(logging.DEBUG)
     formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
@@ -38,3 +54,194 @@ def log_response(log_dir: Path | str, filename: str, obj: dict) -> Path:
     return out
 
 
+_LIVE_SINKS: "weakref.WeakSet[JsonlLogSink]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_live_sinks() -> None:
+    for sink in list(_LIVE_SINKS):
+        sink.close()
+
+
+class JsonlLogSink:
+    """Buffered JSONL writer running on a background thread.
+
+    ``write`` only enqueues; the writer thread batches records into segment
+    files named ``<prefix>-<utc>-<pid>-<seq>.jsonl`` and starts a new segment
+    once the current one exceeds ``max_bytes`` or ``max_age_seconds``. Closed
+    segments are gzipped when ``compress`` is set. When the queue is full,
+    ``overflow`` decides: ``"block"`` waits, ``"drop_new"`` discards the
+    incoming record and ``"drop_old"`` discards the oldest queued one.
+    Sinks are flushed and closed at interpreter exit.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        log_dir: Path | str = "logs",
+        prefix: str = "events",
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age_seconds: float = 3600.0,
+        compress: bool = False,
+        max_queue: int = 10000,
+        overflow: str = "block",
+        flush_interval: float = 1.0,
+        batch_size: int = 256,
+    ) -> None:
+        if overflow not in ("block", "drop_new", "drop_old"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.compress = compress
+        self.overflow = overflow
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._fh = None
+        self._segment: Path | None = None
+        self._segment_started = 0.0
+        self._seq = 0
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        # flush() waits until every accepted record is written or discarded;
+        # counting avoids queue markers that drop_old could throw away
+        self._progress = threading.Condition()
+        self._accepted = 0
+        self._finished = 0
+        # only the most recent segment paths are kept, so long-running sinks don't grow with rotations
+        self.segments: deque[Path] = deque(maxlen=16)
+        self.segment_count = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"evo-log-{prefix}", daemon=True)
+        self._thread.start()
+        _LIVE_SINKS.add(self)
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """Enqueue ``record``; returns False if it was dropped."""
+        if self._closed:
+            raise RuntimeError("log sink is closed")
+        if self.overflow == "block":
+            self._queue.put(record)
+            self._accept()
+            return True
+        try:
+            self._queue.put_nowait(record)
+            self._accept()
+            return True
+        except queue.Full:
+            pass
+        if self.overflow == "drop_new":
+            self.dropped += 1
+            return False
+        # drop_old: make room by discarding the oldest queued record
+        while True:
+            try:
+                old = self._queue.get_nowait()
+                if old is not self._STOP:
+                    self.dropped += 1
+                    self._finish(1)
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(record)
+                self._accept()
+                return True
+            except queue.Full:
+                continue
+
+    def _accept(self) -> None:
+        with self._progress:
+            self._accepted += 1
+
+    def _finish(self, n: int) -> None:
+        with self._progress:
+            self._finished += n
+            self._progress.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until everything enqueued so far is on disk (or was dropped by ``drop_old``)."""
+        with self._progress:
+            target = self._accepted
+            return self._progress.wait_for(lambda: self._finished >= target or not self._thread.is_alive(), timeout)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+        _LIVE_SINKS.discard(self)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"written": self.written, "dropped": self.dropped, "queued": self._queue.qsize(), "segments": self.segment_count}
+
+    def _open_segment(self) -> None:
+        ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        self._seq += 1
+        self._segment = self.log_dir / f"{self.prefix}-{ts}-{os.getpid()}-{self._seq:04d}.jsonl"
+        self._fh = self._segment.open("ab")
+        self._segment_started = time.monotonic()
+        self.segments.append(self._segment)
+        self.segment_count += 1
+
+    def _close_segment(self) -> None:
+        if self._fh is None:
+            return
+        self._fh.close()
+        self._fh = None
+        if self.compress and self._segment is not None:
+            gz = self._segment.with_name(self._segment.name + ".gz")
+            with self._segment.open("rb") as src, gzip.open(gz, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            self._segment.unlink()
+            self.segments[-1] = gz
+
+    def _write_batch(self, batch: list) -> None:
+        if not batch:
+            return
+        if self._fh is None:
+            self._open_segment()
+        data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch).encode("utf-8")
+        self._fh.write(data)
+        self._fh.flush()
+        self.written += len(batch)
+        if self._fh.tell() >= self.max_bytes or time.monotonic() - self._segment_started >= self.max_age_seconds:
+            self._close_segment()
+
+    def _run(self) -> None:
+        batch: list = []
+        stop = False
+        while not stop:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is None and self._closed and self._queue.empty():
+                # the stop sentinel may have been discarded by a racing drop_old write
+                stop = True
+            while item is not None:
+                if item is self._STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            try:
+                self._write_batch(batch)
+            except OSError:
+                logging.getLogger(__name__).exception("Failed to write log batch")
+            self._finish(len(batch))
+            batch = []
+            if self._fh is not None and time.monotonic() - self._segment_started >= self.max_age_seconds:
+                self._close_segment()
+        self._close_segment()
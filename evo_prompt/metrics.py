@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+import bisect
+import math
+import threading
+import time
+
+
+# seconds; wide enough for cache hits (sub-ms) up to slow teacher calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# USD per 1K tokens (prompt, completion); extend via Metrics(prices=...)
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "deepseek-chat": (0.00027, 0.0011),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape_label(value: Any) -> str:
+    """Prometheus text format escapes backslash, double quote and newline in label values."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: LabelKey, extra: Dict[str, str] | None = None) -> str:
+    items = list(key) + sorted((extra or {}).items())
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{_escape_label(v)}"' for k, v in items)
+    return "{" + body + "}"
+
+
+def percentile(sorted_values: List[float], p: float) -> float | None:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Histogram:
+    """Cumulative-bucket histogram that also keeps a bounded sample for percentiles."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, max_samples: int = 10000) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max_samples = max_samples
+        self.samples: List[float] = []
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if len(self.samples) < self.max_samples:
+            self.samples.append(value)
+        else:
+            # keep the most recent window
+            self.samples[self.count % self.max_samples] = value
+
+    def summary(self) -> Dict[str, Any]:
+        values = sorted(self.samples)
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+            "max": values[-1] if values else None,
+        }
+
+
+class Metrics:
+    """In-process counters, latency histograms and timing spans.
+
+    Spans time a stage (``with metrics.span("student_generate", model=m)``)
+    into the ``evo_stage_seconds`` histogram. ``record_usage`` sums request
+    and token counters per model. Export with ``to_prometheus`` /
+    ``write_prometheus`` / ``serve_prometheus``, or ``summary`` for a per-run
+    report with p50/p95/p99 and estimated cost.
+    """
+
+    def __init__(self, prices: Dict[str, Tuple[float, float]] | None = None) -> None:
+        self.prices = dict(DEFAULT_PRICES)
+        self.prices.update(prices or {})
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.started = time.time()
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+
+    @contextmanager
+    def span(self, stage: str, **labels: Any) -> Iterator[Dict[str, Any]]:
+        """Time a block; set ``span["status"]`` to tag the outcome (default ok/error)."""
+        info: Dict[str, Any] = {"status": "ok"}
+        start = time.perf_counter()
+        try:
+            yield info
+        except BaseException:
+            info["status"] = "error"
+            raise
+        finally:
+            self.observe("evo_stage_seconds", time.perf_counter() - start, stage=stage, status=info["status"], **labels)
+
+    def record_usage(self, model: str, usage: Dict[str, Any] | None, role: str = "student") -> None:
+        usage = usage or {}
+        self.inc("evo_requests_total", model=model, role=role)
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                self.inc("evo_tokens_total", usage[kind], model=model, role=role, kind=kind.split("_")[0])
+
+    def counter(self, name: str, **labels: Any) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels(labels), 0.0)
+
+    def estimated_cost(self) -> Dict[str, float]:
+        """USD per model from token counters and ``prices``; unknown models are skipped."""
+        out: Dict[str, float] = {}
+        with self._lock:
+            for key, value in self._counters.get("evo_tokens_total", {}).items():
+                labels = dict(key)
+                price = self.prices.get(labels.get("model", ""))
+                if not price:
+                    continue
+                rate = price[0] if labels.get("kind") == "prompt" else price[1]
+                out[labels["model"]] = out.get(labels["model"], 0.0) + value / 1000.0 * rate
+        return out
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {}
+            for key, hist in self._histograms.get("evo_stage_seconds", {}).items():
+                labels = dict(key)
+                name = labels.pop("stage")
+                suffix = ",".join(f"{k}={v}" for k, v in sorted(labels.items()) if k != "status" or v != "ok")
+                stages[f"{name}[{suffix}]" if suffix else name] = hist.summary()
+            counters = {
+                name + _fmt_labels(key): value
+                for name, series in self._counters.items()
+                for key, value in series.items()
+            }
+        cost = self.estimated_cost()
+        return {
+            "elapsed_seconds": time.time() - self.started,
+            "stages": stages,
+            "counters": counters,
+            "estimated_cost_usd": cost,
+            "estimated_cost_total_usd": sum(cost.values()),
+        }
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_fmt_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in series.items():
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_fmt_labels(key, {'le': f'{bound:g}'})} {cumulative}")
+                    lines.append(f"{name}_bucket{_fmt_labels(key, {'le': '+Inf'})} {hist.count}")
+                    lines.append(f"{name}_sum{_fmt_labels(key)} {hist.sum:g}")
+                    lines.append(f"{name}_count{_fmt_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path | str) -> Path:
+        """Write the text exposition format (e.g. for node_exporter's textfile collector)."""
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(p.name + ".tmp")
+        tmp.write_text(self.to_prometheus(), encoding="utf-8")
+        tmp.replace(p)
+        return p
+
+    def serve_prometheus(self, port: int = 9464, host: str = "127.0.0.1") -> Any:
+        """Serve ``/metrics`` from a daemon thread; returns the HTTP server."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                return None
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="evo-metrics", daemon=True).start()
+        return server
@@ -17,11 +17,13 @@ class Optimizer:
             return {"new_prompt_text": suggested, "change_summary": "Adopted teacher suggested prompt.", "diff": {}}
 
         # Otherwise, make a conservative improvement: append a clarifying instruction
-        current = self.prompt_store.get_prompt(prompt_name)
-        if not current:
+        base_text = self.prompt_store.get_current_text(prompt_name)
+        if base_text is None:
             return {"new_prompt_text": None, "change_summary": "Prompt not found.", "diff": {}}
+        return self.fallback_improvement(base_text)
 
-        base_text = current.get("text", "")
+    def fallback_improvement(self, base_text: str) -> Dict[str, Any]:
+        """The proposal used when the teacher suggests nothing; depends only on ``base_text``."""
         addition = "\nPlease be more specific about structure, include examples and required format."
         new_text = base_text + addition
 
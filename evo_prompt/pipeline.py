@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List
+import asyncio
+
+from .workflow import Workflow, compose_prompt
+
+
+def _quiet(task: asyncio.Task) -> None:
+    # discarded speculative calls may fail; nobody awaits them
+    if not task.cancelled():
+        task.exception()
+
+
+class PipelinedRounds:
+    """Optimization rounds with overlapping model calls.
+
+    Same steps as calling ``Workflow.run_iteration`` and applying the
+    proposal each round, but:
+
+    - while the teacher evaluates round ``r``, the student already generates
+      for the optimizer's fallback proposal (which depends only on the
+      current prompt); it is kept if that proposal is chosen, cancelled
+      otherwise (e.g. the teacher returned ``suggested_prompt``). Speculation
+      pauses once its hit rate after a few rounds is below ``min_hit_rate``;
+    - the next round's student call starts as soon as the proposal is known,
+      and persisting results / updating the store run in a worker thread
+      alongside it.
+
+    "As soon as the proposal is known" means once the teacher's reply is
+    parsed, not while it streams: ``suggested_prompt`` is the last key of one
+    JSON object and is only usable when that object is complete (with
+    ``Evaluator(stream=True)`` the reply already stops at its closing brace),
+    and choosing the proposal makes no model call.
+    """
+
+    def __init__(self, workflow: Workflow, speculate: bool = True, min_hit_rate: float = 0.3) -> None:
+        self.workflow = workflow
+        self.speculate = speculate
+        self.min_hit_rate = min_hit_rate
+        self.hits = 0
+        self.misses = 0
+
+    def _should_speculate(self) -> bool:
+        tries = self.hits + self.misses
+        return self.speculate and (tries < 3 or self.hits / tries >= self.min_hit_rate)
+
+    def _start(self, text: str, input_context: str) -> asyncio.Task:
+        task = asyncio.ensure_future(self.workflow.generate_student(compose_prompt(text, input_context)))
+        task.add_done_callback(_quiet)
+        return task
+
+    def _bookkeep(self, prompt_name: str, version: int | None, item: Dict[str, Any], out: Dict[str, Any],
+                  new_text: str | None, reason: str) -> int | None:
+        wf = self.workflow
+        wf._persist_iteration(prompt_name, version, item, out)
+        if new_text is None:
+            return version
+        head = wf.prompt_store.add_or_update_prompt(prompt_name, new_text, author="auto_optimizer", reason=reason)
+        return head.get("version")
+
+    async def run(
+        self,
+        prompt_name: str,
+        input_context: str,
+        rounds: int = 3,
+        apply: bool = True,
+        on_round: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> Dict[str, Any]:
+        """Run ``rounds`` rounds; each result has the ``run_iteration`` keys plus ``round`` and ``applied``."""
+        wf = self.workflow
+        with wf.metrics.span("prompt_load"):
+            head = wf._load_head(prompt_name)
+        text = head.get("text", "")
+        version = head.get("version")
+        results: List[Dict[str, Any]] = []
+        current = self._start(text, input_context)
+        spec: asyncio.Task | None = None
+        try:
+            for rnd in range(1, rounds + 1):
+                student_resp = await current
+                prompt_text = compose_prompt(text, input_context)
+                resp_id = wf._log_student(prompt_name, prompt_text, student_resp)
+                last = rnd == rounds
+
+                spec_text = None
+                if apply and not last and self._should_speculate():
+                    spec_text = wf.optimizer.fallback_improvement(text)["new_prompt_text"]
+                    spec = self._start(spec_text, input_context)
+
+                evaluation = await wf.evaluate_output(prompt_name, resp_id, prompt_text, student_resp)
+                with wf.metrics.span("optimize"):
+                    proposed = await wf.optimizer.propose_improvement(prompt_name, student_resp.get("text", ""), evaluation or {})
+                new_text = proposed.get("new_prompt_text") if apply else None
+                if new_text == text:
+                    new_text = None
+                next_text = new_text or text
+
+                if not last:
+                    if spec is not None and next_text == spec_text:
+                        current = spec
+                        self.hits += 1
+                        wf.metrics.inc("evo_speculation_total", result="hit")
+                    else:
+                        if spec is not None:
+                            spec.cancel()
+                            self.misses += 1
+                            wf.metrics.inc("evo_speculation_total", result="miss")
+                        current = self._start(next_text, input_context)
+                    spec = None
+
+                item = {"id": resp_id, "prompt_text": prompt_text, "student_response": student_resp, "evaluation": evaluation}
+                out = {"prompt_name": prompt_name, "student_response": student_resp, "evaluation": evaluation, "proposed": proposed}
+                # persistence and the store update overlap with the next student call
+                version = await asyncio.to_thread(self._bookkeep, prompt_name, version, item, out, new_text, f"pipelined-round-{rnd}")
+                text = next_text
+                out.update({"round": rnd, "applied": new_text is not None})
+                results.append(out)
+                if on_round:
+                    on_round(out)
+        finally:
+            for task in (current, spec):
+                if task is not None and not task.done():
+                    task.cancel()
+        return {"rounds": results, "speculation": {"hits": self.hits, "misses": self.misses}}
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, Any, List, Sequence, Tuple
+import asyncio
+import random
+
+from .racing import Racer
+from .workflow import Workflow
+
+
+MUTATION_TEMPLATE = (
+    "You are a prompt engineer. Rewrite the prompt below so that a model following it produces better output."
+    " Keep the task the same. Respond only with the new prompt text.\n\n"
+    "Prompt:\n{prompt}\n\n"
+    "Evaluator feedback on outputs produced with this prompt:\n{feedback}\n"
+)
+
+CROSSOVER_TEMPLATE = (
+    "You are a prompt engineer. Combine the strongest instructions of the two prompts below into a single prompt"
+    " for the same task. Respond only with the new prompt text.\n\n"
+    "Prompt A:\n{a}\n\n"
+    "Prompt B:\n{b}\n"
+)
+
+
+def _clean_prompt_text(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        lines = text.splitlines()[1:]
+        if lines and lines[-1].strip().startswith("```"):
+            lines = lines[:-1]
+        text = "\n".join(lines).strip()
+    return text
+
+
+class PopulationOptimizer:
+    """Evolutionary prompt search over a population of variants.
+
+    Each generation scores every unscored candidate concurrently through
+    ``Workflow.score_text``, selects parents (``"elitist"`` or
+    ``"tournament"``) and asks the teacher for mutations and crossovers.
+    Fitness is memoized by prompt text, so survivors are not re-scored.
+    With a ``racer`` new candidates are raced on growing input prefixes
+    instead, and clear losers keep the fitness of the inputs they reached.
+    """
+
+    def __init__(
+        self,
+        workflow: Workflow,
+        population_size: int = 6,
+        elite: int = 2,
+        selection: str = "elitist",
+        tournament_size: int = 3,
+        crossover_rate: float = 0.3,
+        concurrency: int = 4,
+        seed: int | None = None,
+        racer: Racer | None = None,
+    ) -> None:
+        if selection not in ("elitist", "tournament"):
+            raise ValueError(f"Unknown selection strategy: {selection}")
+        self.workflow = workflow
+        self.teacher = workflow.teacher
+        self.prompt_store = workflow.prompt_store
+        self.population_size = max(2, population_size)
+        self.elite = max(1, min(elite, self.population_size))
+        self.selection = selection
+        self.tournament_size = max(2, tournament_size)
+        self.crossover_rate = crossover_rate
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+        self.racer = racer
+        self._fitness: Dict[str, Dict[str, Any]] = {}
+
+    def seed_population(self, prompt_name: str) -> List[str]:
+        """Distinct prompt texts from the store, newest first."""
+        current = self.prompt_store.get_head(prompt_name)
+        if not current:
+            raise ValueError(f"Prompt not found: {prompt_name}")
+        texts = [current.get("text", "")]
+        for entry in reversed(list(self.prompt_store.iter_history(prompt_name))):
+            text = entry.get("text")
+            if text and text not in texts:
+                texts.append(text)
+            if len(texts) >= self.population_size:
+                break
+        return texts
+
+    async def _ask_teacher(self, prompt: str) -> str | None:
+        try:
+            resp = await self.teacher.generate(prompt, temperature=0.7, max_tokens=512)
+        except Exception:
+            return None
+        text = _clean_prompt_text(resp.get("text", ""))
+        return text or None
+
+    async def mutate(self, text: str) -> str | None:
+        feedback = "\n".join(self._fitness.get(text, {}).get("feedback", [])[:3]) or "(none)"
+        return await self._ask_teacher(MUTATION_TEMPLATE.format(prompt=text, feedback=feedback))
+
+    async def mutate_many(self, text: str, n: int) -> List[str]:
+        """``n`` mutations of ``text`` from a single teacher request (API ``n`` parameter)."""
+        if n == 1:
+            child = await self.mutate(text)
+            return [child] if child else []
+        feedback = "\n".join(self._fitness.get(text, {}).get("feedback", [])[:3]) or "(none)"
+        try:
+            resp = await self.teacher.generate_many(MUTATION_TEMPLATE.format(prompt=text, feedback=feedback), n=n, temperature=0.7, max_tokens=512)
+        except Exception:
+            return []
+        children = [_clean_prompt_text(c.get("text", "")) for c in resp.get("choices", [])]
+        return [c for c in children if c]
+
+    async def crossover(self, a: str, b: str) -> str | None:
+        return await self._ask_teacher(CROSSOVER_TEMPLATE.format(a=a, b=b))
+
+    def _score(self, text: str) -> float:
+        mean = self._fitness.get(text, {}).get("stats", {}).get("mean")
+        return mean if mean is not None else float("-inf")
+
+    def _rank_key(self, text: str) -> Tuple[bool, float]:
+        # arms eliminated by the racer only have a noisy partial mean; survivors rank first
+        return (self._fitness.get(text, {}).get("eliminated_at") is None, self._score(text))
+
+    async def evaluate_population(self, texts: Sequence[str], inputs: Sequence[str]) -> List[Dict[str, Any]]:
+        todo = [t for t in dict.fromkeys(texts) if t not in self._fitness]
+        if self.racer is not None and len(todo) > 1:
+            raced = {arm["text"]: arm for arm in (await self.racer.race(todo, inputs))["ranked"]}
+            results = [raced[t] for t in todo]
+        else:
+            results = await asyncio.gather(*(self.workflow.score_text(t, inputs, concurrency=self.concurrency) for t in todo))
+        for text, res in zip(todo, results):
+            self._fitness[text] = res
+        ranked = sorted(dict.fromkeys(texts), key=self._rank_key, reverse=True)
+        return [self._fitness[t] for t in ranked]
+
+    def _pick_parent(self, ranked: List[str]) -> str:
+        if self.selection == "tournament":
+            contenders = self.rng.sample(ranked, min(self.tournament_size, len(ranked)))
+            return max(contenders, key=self._rank_key)
+        # elitist: breed from the top half
+        return self.rng.choice(ranked[: max(1, len(ranked) // 2)])
+
+    async def _offspring(self, ranked: List[str], count: int) -> List[str]:
+        crossovers = []
+        mutations: Counter[str] = Counter()
+        for _ in range(count):
+            parent = self._pick_parent(ranked)
+            if len(ranked) > 1 and self.rng.random() < self.crossover_rate:
+                other = self._pick_parent([t for t in ranked if t != parent])
+                crossovers.append(self.crossover(parent, other))
+            else:
+                mutations[parent] += 1
+        # all mutations of one parent come from one multi-sample request
+        mutated = asyncio.gather(*(self.mutate_many(parent, k) for parent, k in mutations.items()))
+        crossed = asyncio.gather(*crossovers)
+        mutated_lists, crossed_children = await asyncio.gather(mutated, crossed)
+        children = [c for group in mutated_lists for c in group] + list(crossed_children)
+        return [c for c in children if c]
+
+    async def evolve(self, prompt_name: str, inputs: Sequence[str], generations: int = 3, apply: bool = True) -> Dict[str, Any]:
+        """Run ``generations`` rounds and optionally store the best prompt.
+
+        Returns the best candidate (text and score stats) and per-generation
+        summaries.
+        """
+        if generations < 1:
+            raise ValueError("generations must be >= 1")
+        inputs = list(inputs)
+        population = self.seed_population(prompt_name)
+        current_text = population[0]
+        history = []
+
+        for gen in range(generations):
+            # pad a thin seed population with mutations of what we have
+            if len(population) < self.population_size:
+                await self.evaluate_population(population, inputs)
+                ranked = sorted(population, key=self._rank_key, reverse=True)
+                population += await self._offspring(ranked, self.population_size - len(population))
+
+            scored = await self.evaluate_population(population, inputs)
+            ranked = [s["text"] for s in scored]
+            history.append({
+                "generation": gen + 1,
+                "best_score": scored[0]["stats"]["mean"],
+                "scores": [s["stats"]["mean"] for s in scored],
+            })
+
+            if gen == generations - 1:
+                break
+            survivors = ranked[: self.elite]
+            children = await self._offspring(ranked, self.population_size - len(survivors))
+            population = survivors + [c for c in children if c not in survivors]
+
+        best = self._fitness[ranked[0]]
+        applied = False
+        if apply and best["text"] != current_text and self._rank_key(best["text"]) > self._rank_key(current_text):
+            self.prompt_store.add_or_update_prompt(prompt_name, best["text"], author="population_optimizer", reason=f"evolve-{generations}-generations")
+            applied = True
+        return {"best": best, "applied": applied, "generations": history}
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Pattern, Sequence
+import json
+import re
+
+try:  # optional: full JSON Schema validation
+    import jsonschema
+except ImportError:  # pragma: no cover - exercised only without the extra
+    jsonschema = None
+
+
+class PreScorer(ABC):
+    """Fast deterministic check run before the teacher.
+
+    ``check`` returns ``{"name", "score" (0-100), "passed", "reason"}``. A
+    failed ``hard`` scorer rejects the output without calling the teacher;
+    soft scorers only contribute their score as a criterion.
+    """
+
+    name: str = "prescorer"
+    hard: bool = True
+
+    @abstractmethod
+    def check(self, text: str, instruction: str | None = None) -> Dict[str, Any]:
+        raise NotImplementedError()
+
+    def _result(self, passed: bool, score: float | None = None, reason: str = "") -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "score": (100.0 if passed else 0.0) if score is None else score,
+            "passed": passed,
+            "reason": reason,
+        }
+
+
+@dataclass
+class NonEmptyScorer(PreScorer):
+    name: str = "non_empty"
+    hard: bool = True
+
+    def check(self, text: str, instruction: str | None = None) -> Dict[str, Any]:
+        if text and text.strip():
+            return self._result(True)
+        return self._result(False, reason="output is empty")
+
+
+@dataclass
+class LengthScorer(PreScorer):
+    """Characters within ``[min_chars, max_chars]``; either bound may be None."""
+
+    min_chars: int | None = None
+    max_chars: int | None = None
+    name: str = "length"
+    hard: bool = True
+
+    def check(self, text: str, instruction: str | None = None) -> Dict[str, Any]:
+        n = len(text or "")
+        if self.min_chars is not None and n < self.min_chars:
+            return self._result(False, 100.0 * n / self.min_chars, f"output has {n} chars, minimum is {self.min_chars}")
+        if self.max_chars is not None and n > self.max_chars:
+            return self._result(False, 100.0 * self.max_chars / n, f"output has {n} chars, maximum is {self.max_chars}")
+        return self._result(True)
+
+
+@dataclass
+class RegexScorer(PreScorer):
+    """Output must (or, with ``must_match=False``, must not) match ``pattern``."""
+
+    pattern: str = ""
+    must_match: bool = True
+    flags: int = 0
+    name: str = "regex"
+    hard: bool = True
+    _compiled: Pattern[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._compiled = re.compile(self.pattern, self.flags)
+
+    def check(self, text: str, instruction: str | None = None) -> Dict[str, Any]:
+        found = self._compiled.search(text or "") is not None
+        if found == self.must_match:
+            return self._result(True)
+        verb = "does not match" if self.must_match else "matches forbidden"
+        return self._result(False, reason=f"output {verb} pattern {self.pattern!r}")
+
+
+def _basic_schema_errors(value: Any, schema: Dict[str, Any]) -> List[str]:
+    """Top-level ``type``/``required`` checks used when jsonschema is not installed."""
+    types = {"object": dict, "array": list, "string": str, "number": (int, float), "integer": int, "boolean": bool}
+    expected = schema.get("type")
+    if isinstance(expected, str) and expected in types and not isinstance(value, types[expected]):
+        return [f"expected {expected}, got {type(value).__name__}"]
+    if isinstance(value, dict):
+        return [f"missing required key {k!r}" for k in schema.get("required", []) if k not in value]
+    return []
+
+
+@dataclass
+class JSONScorer(PreScorer):
+    """Output must parse as JSON and, if ``schema`` is given, validate against it.
+
+    Fenced code blocks are unwrapped first. Full validation needs the optional
+    ``jsonschema`` package; without it only top-level ``type`` and
+    ``required`` are checked.
+    """
+
+    schema: Dict[str, Any] | None = None
+    name: str = "json"
+    hard: bool = True
+
+    def check(self, text: str, instruction: str | None = None) -> Dict[str, Any]:
+        body = (text or "").strip()
+        if body.startswith("```"):
+            body = body.split("\n", 1)[-1].rsplit("```", 1)[0]
+        try:
+            value = json.loads(body)
+        except ValueError as e:
+            return self._result(False, reason=f"output is not valid JSON: {e}")
+        if not self.schema:
+            return self._result(True)
+        if jsonschema is not None:
+            errors = [e.message for e in jsonschema.Draft7Validator(self.schema).iter_errors(value)]
+        else:
+            errors = _basic_schema_errors(value, self.schema)
+        if errors:
+            return self._result(False, reason="schema: " + "; ".join(errors[:3]))
+        return self._result(True)
+
+
+def run_prescorers(scorers: Sequence[PreScorer], text: str, instruction: str | None = None) -> List[Dict[str, Any]]:
+    """Run ``scorers`` in order, stopping after the first hard failure."""
+    results = []
+    for scorer in scorers:
+        res = scorer.check(text, instruction)
+        results.append(res)
+        if scorer.hard and not res["passed"]:
+            break
+    return results
+
+
+def weighted_score(criteria: Dict[str, Any], weights: Dict[str, float], fallback: Any = 0) -> Any:
+    """Weighted mean of the numeric ``criteria`` named in ``weights``.
+
+    Weights are renormalised over the criteria actually present; ``fallback``
+    (usually the teacher's overall score) is returned when none are.
+    """
+    total = 0.0
+    norm = 0.0
+    for name, weight in weights.items():
+        value = criteria.get(name)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or weight <= 0:
+            continue
+        total += weight * value
+        norm += weight
+    return total / norm if norm else fallback
@@ -1,12 +1,23 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, asdict
+from difflib import SequenceMatcher
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List
+from contextlib import contextmanager
+import bisect
 import json
+import os
+import threading
+import time
 from datetime import datetime
 
 
+# process-wide cache of parsed head records: path -> ((ino, mtime_ns, size), head)
+_HEAD_CACHE: Dict[str, tuple] = {}
+_HEAD_CACHE_LOCK = threading.Lock()
+
+
 @dataclass
 class PromptMetadata:
     name: str
@@ -17,48 +28,269 @@ class PromptMetadata:
     meta: Dict[str, Any]
 
 
+def make_delta(old: str, new: str) -> List[list]:
+    """Encode ``new`` as edits against ``old``: ``[start, end, replacement]``."""
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag != "equal":
+            ops.append([i1, i2, new[j1:j2]])
+    return ops
+
+
+def apply_delta(old: str, ops: List[list]) -> str:
+    parts = []
+    pos = 0
+    for i1, i2, replacement in ops:
+        parts.append(old[pos:i1])
+        parts.append(replacement)
+        pos = i2
+    parts.append(old[pos:])
+    return "".join(parts)
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
 class PromptStore:
-    """Simple JSON-backed prompt store with version history."""
+    """JSON-backed prompt store with an append-only version log.
+
+    ``<name>.json`` is a small head record (current text, version, meta) so the
+    current prompt is one small read. Every version is appended to
+    ``<name>.log.jsonl`` as a delta against its predecessor, with a full
+    snapshot every ``snapshot_every`` versions whose log offsets are indexed
+    in the head, so an old version is rebuilt from the nearest snapshot
+    before it. Legacy files that embed ``history`` are read as-is and migrated
+    on their next update.
+    """
 
-    def __init__(self, store_dir: Path | str = "prompts") -> None:
+    def __init__(self, store_dir: Path | str = "prompts", snapshot_every: int = 16) -> None:
         self.store_dir = Path(store_dir)
         self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_every = max(1, snapshot_every)
 
     def _path_for(self, name: str) -> Path:
         return self.store_dir / f"{name}.json"
 
+    def _log_path_for(self, name: str) -> Path:
+        return self.store_dir / f"{name}.log.jsonl"
+
+    @contextmanager
+    def _locked(self, name: str, timeout: float = 30.0, stale_after: float = 120.0) -> Iterator[None]:
+        """Cross-process writer lock (lock file created with O_EXCL)."""
+        lock = self.store_dir / f".{name}.lock"
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - lock.stat().st_mtime > stale_after:
+                        lock.unlink(missing_ok=True)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for prompt lock: {lock}")
+                time.sleep(0.01)
+        try:
+            os.write(fd, str(os.getpid()).encode("ascii"))
+            os.close(fd)
+            yield
+        finally:
+            lock.unlink(missing_ok=True)
+
     def list_prompts(self) -> list[str]:
         return [p.stem for p in self.store_dir.glob("*.json")]
 
-    def get_prompt(self, name: str) -> Dict[str, Any] | None:
+    def _read_head(self, name: str) -> Dict[str, Any] | None:
+        """Parsed head, re-read only when the file's inode, mtime or size changes.
+
+        The returned dict is shared; callers must not mutate it.
+        """
+        path = self._path_for(name)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        key = os.path.abspath(path)
+        with _HEAD_CACHE_LOCK:
+            hit = _HEAD_CACHE.get(key)
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+        obj = json.loads(path.read_text(encoding="utf-8"))
+        obj.pop("history", None)
+        with _HEAD_CACHE_LOCK:
+            _HEAD_CACHE[key] = (stamp, obj)
+        return obj
+
+    def get_head(self, name: str) -> Dict[str, Any] | None:
+        """Current version without history."""
+        head = self._read_head(name)
+        if head is None:
+            return None
+        out = dict(head)
+        out["meta"] = dict(head.get("meta", {}))
+        return out
+
+    def get_current_text(self, name: str) -> str | None:
+        """Current prompt text only; served from the read cache when unchanged."""
+        head = self._read_head(name)
+        return None if head is None else head.get("text", "")
+
+    def iter_history(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Yield history entries (with full text) oldest first, rebuilding deltas."""
         path = self._path_for(name)
         if not path.exists():
+            return
+        head = json.loads(path.read_text(encoding="utf-8"))
+        if "log_size" not in head:
+            yield from self._legacy_history(head)
+            return
+        yield from self._iter_log(name, head["log_size"])
+
+    def _iter_log(self, name: str, log_size: int, offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """Entries of the committed log prefix from ``offset`` (a snapshot record), read line by line."""
+        log_path = self._log_path_for(name)
+        if not log_path.exists():
+            return
+        text = ""
+        with log_path.open("rb") as fh:
+            fh.seek(offset)
+            pos = offset
+            # only the committed prefix counts; see add_or_update_prompt
+            while pos < log_size:
+                line = fh.readline()
+                pos += len(line)
+                if pos > log_size or not line:
+                    break
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if "snapshot" in rec:
+                    text = rec.pop("snapshot")
+                else:
+                    text = apply_delta(text, rec.pop("delta"))
+                rec["text"] = text
+                yield rec
+
+    def get_version(self, name: str, version: int) -> Dict[str, Any] | None:
+        head = self._read_head(name)
+        if head is None:
+            return None
+        snapshots = head.get("snapshots")
+        if "log_size" not in head or not snapshots:
+            # legacy file or a head written before the snapshot index
+            entries: Iterator[Dict[str, Any]] = self.iter_history(name)
+        else:
+            # the log always opens with a snapshot, so offset 0 covers versions before the first indexed one
+            i = bisect.bisect_right([v for v, _ in snapshots], version) - 1
+            entries = self._iter_log(name, head["log_size"], snapshots[i][1] if i >= 0 else 0)
+        for entry in entries:
+            if entry.get("version") == version:
+                return entry
+            if entry.get("version", 0) > version and snapshots:
+                break
+        return None
+
+    def get_prompt(self, name: str) -> Dict[str, Any] | None:
+        head = self.get_head(name)
+        if head is None:
             return None
-        return json.loads(path.read_text(encoding="utf-8"))
+        head["history"] = list(self.iter_history(name))
+        return head
+
+    def _log_record(self, entry: Dict[str, Any], prev_text: str | None) -> Dict[str, Any]:
+        rec = {k: v for k, v in entry.items() if k != "text"}
+        if prev_text is None or (entry["version"] - 1) % self.snapshot_every == 0:
+            rec["snapshot"] = entry["text"]
+        else:
+            rec["delta"] = make_delta(prev_text, entry["text"])
+        return rec
+
+    @staticmethod
+    def _legacy_history(head: Dict[str, Any]) -> List[Dict[str, Any]]:
+        history = head.get("history")
+        if history:
+            return history
+        # hand-written file without any history: treat the current text as the only version
+        return [{"version": head.get("version", 1), "text": head.get("text", ""), "author": head.get("meta", {}).get("author", "user"), "timestamp": ""}]
+
+    def _migrate_legacy(self, name: str, head: Dict[str, Any]) -> Dict[str, Any]:
+        """Write the embedded history of a legacy file to the log."""
+        lines = []
+        snapshots = []
+        size = 0
+        prev = None
+        history = self._legacy_history(head)
+        head.pop("history", None)
+        for entry in history:
+            entry = dict(entry)
+            entry.setdefault("version", len(lines) + 1)
+            rec = self._log_record(entry, prev)
+            if "snapshot" in rec:
+                snapshots.append([entry["version"], size])
+            line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+            lines.append(line)
+            size += len(line)
+            prev = entry.get("text", "")
+        data = b"".join(lines)
+        _atomic_write(self._log_path_for(name), data)
+        head["log_size"] = len(data)
+        head["snapshots"] = snapshots
+        return head
 
     def add_or_update_prompt(self, name: str, text: str, author: str = "user", reason: str = "update") -> Dict[str, Any]:
+        """Append a new version and return the new head record."""
         path = self._path_for(name)
+        log_path = self._log_path_for(name)
         now = datetime.utcnow().isoformat() + "Z"
-        if path.exists():
-            obj = json.loads(path.read_text(encoding="utf-8"))
-            version = obj.get("version", 1) + 1
-            history = obj.get("history", [])
-        else:
-            version = 1
-            history = []
-
-        entry = {"version": version, "text": text, "author": author, "timestamp": now, "reason": reason}
-        history.append(entry)
+        with self._locked(name):
+            if path.exists():
+                head = json.loads(path.read_text(encoding="utf-8"))
+                if "log_size" not in head:
+                    head = self._migrate_legacy(name, head)
+                version = head.get("version", 1) + 1
+                prev_text = head.get("text", "")
+                log_size = head.get("log_size", 0)
+                snapshots = list(head.get("snapshots", []))
+            else:
+                version = 1
+                prev_text = None
+                log_size = 0
+                snapshots = []
 
-        out = {
-            "name": name,
-            "version": version,
-            "text": text,
-            "history": history,
-            "meta": {"last_updated": now, "author": author},
-        }
+            entry = {"version": version, "text": text, "author": author, "timestamp": now, "reason": reason}
+            rec = self._log_record(entry, prev_text)
+            if "snapshot" in rec:
+                snapshots.append([version, log_size])
+            line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+            with log_path.open("ab") as fh:
+                # drop any tail a crashed writer appended without committing the head
+                if fh.tell() != log_size:
+                    fh.truncate(log_size)
+                fh.write(line)
+                fh.flush()
+                os.fsync(fh.fileno())
 
-        path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+            out = {
+                "name": name,
+                "version": version,
+                "text": text,
+                "meta": {"last_updated": now, "author": author},
+                "log_size": log_size + len(line),
+                # [version, log offset] of every full snapshot, for get_version
+                "snapshots": snapshots,
+            }
+            # the head is the commit point for the appended version
+            _atomic_write(path, json.dumps(out, ensure_ascii=False, indent=2).encode("utf-8"))
         return out
 
     def save_version(self, name: str, text: str, reason: str = "save") -> None:
@@ -66,9 +298,11 @@ class PromptStore:
         self.add_or_update_prompt(name, text, reason=reason)
 
     def export_all(self, out_path: Path) -> None:
-        out = {}
-        for name in self.list_prompts():
-            out[name] = self.get_prompt(name)
-        Path(out_path).write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
-
-
+        """Write ``{name: prompt}`` for every prompt, one prompt in memory at a time."""
+        names = self.list_prompts()
+        with Path(out_path).open("w", encoding="utf-8") as fh:
+            fh.write("{")
+            for i, name in enumerate(names):
+                obj = json.dumps(self.get_prompt(name), ensure_ascii=False, indent=2).replace("\n", "\n  ")
+                fh.write(("," if i else "") + f"\n  {json.dumps(name, ensure_ascii=False)}: {obj}")
+            fh.write("\n}" if names else "}")
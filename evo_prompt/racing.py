@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Sequence, Tuple
+import asyncio
+import math
+
+from .workflow import Workflow, score_stats
+
+
+def confidence_intervals(samples: Sequence[Sequence[float]], z: float = 1.96, min_stdev: float = 5.0) -> List[Tuple[float, float, float]]:
+    """``(mean, low, high)`` for every arm in one pass.
+
+    Normal approximation with the sample stdev floored at ``min_stdev`` so a
+    couple of identical scores do not collapse the interval to a point.
+    Arms without samples get ``(nan, -inf, inf)``.
+    """
+    out = []
+    for values in samples:
+        n = len(values)
+        if n == 0:
+            out.append((math.nan, -math.inf, math.inf))
+            continue
+        mean = math.fsum(values) / n
+        var = math.fsum((v - mean) ** 2 for v in values) / (n - 1) if n > 1 else 0.0
+        half = z * max(math.sqrt(var), min_stdev) / math.sqrt(n)
+        out.append((mean, mean - half, mean + half))
+    return out
+
+
+def _numeric(values: Sequence[Any]) -> List[float]:
+    out = []
+    for v in values:
+        try:
+            out.append(float(v))
+        except (TypeError, ValueError):
+            continue
+    return out
+
+
+class Racer:
+    """Score candidate prompts on growing prefixes of a dataset, dropping clear losers.
+
+    Rung ``k`` extends every surviving candidate to ``min_inputs * eta**k``
+    inputs. After each rung a candidate is eliminated when its upper
+    confidence bound is below the best lower bound (``method="racing"``);
+    ``method="halving"`` additionally keeps only the top ``1/eta`` by mean,
+    as in successive halving. Racing stops once ``keep`` candidates remain or
+    the dataset is exhausted.
+    """
+
+    def __init__(
+        self,
+        workflow: Workflow,
+        method: str = "racing",
+        min_inputs: int = 2,
+        eta: float = 2.0,
+        keep: int = 1,
+        z: float = 1.96,
+        min_stdev: float = 5.0,
+        concurrency: int = 4,
+    ) -> None:
+        if method not in ("racing", "halving"):
+            raise ValueError(f"Unknown racing method: {method}")
+        if eta <= 1:
+            raise ValueError("eta must be > 1")
+        self.workflow = workflow
+        self.method = method
+        self.min_inputs = max(1, min_inputs)
+        self.eta = eta
+        self.keep = max(1, keep)
+        self.z = z
+        self.min_stdev = min_stdev
+        self.concurrency = concurrency
+
+    def _schedule(self, total: int) -> List[int]:
+        sizes = []
+        n = float(self.min_inputs)
+        while True:
+            size = min(total, int(math.ceil(n)))
+            if not sizes or size > sizes[-1]:
+                sizes.append(size)
+            if size >= total:
+                return sizes
+            n *= self.eta
+
+    def _survivors(self, alive: List[int], arms: List[Dict[str, Any]]) -> List[int]:
+        bounds = dict(zip(alive, confidence_intervals([arms[i]["scores"] for i in alive], self.z, self.min_stdev)))
+        best_low = max(low for _, low, _ in bounds.values())
+        kept = [i for i in alive if bounds[i][2] >= best_low]
+        if self.method == "halving":
+            kept.sort(key=lambda i: -math.inf if math.isnan(bounds[i][0]) else bounds[i][0], reverse=True)
+            kept = kept[: max(self.keep, int(math.ceil(len(alive) / self.eta)))]
+        return kept
+
+    async def race(self, candidates: Sequence[str], inputs: Sequence[str], prompt_name: str = "") -> Dict[str, Any]:
+        """Race ``candidates`` over ``inputs`` (used in the given order; shuffle beforehand if needed).
+
+        Returns ``ranked`` arms (text, scores, stats, ci, inputs_used,
+        eliminated_at, feedback, errors), the rung sizes and how many
+        (candidate, input) evaluations were spent versus the full grid.
+        """
+        texts = list(dict.fromkeys(candidates))
+        inputs = list(inputs)
+        arms = [{"text": t, "scores": [], "feedback": [], "errors": 0, "inputs_used": 0, "eliminated_at": None} for t in texts]
+        alive = list(range(len(arms)))
+        rungs = self._schedule(len(inputs)) if inputs else []
+        spent = 0
+
+        for rung, size in enumerate(rungs, 1):
+            async def extend(i: int) -> None:
+                arm = arms[i]
+                res = await self.workflow.score_text(arm["text"], inputs[arm["inputs_used"]:size], concurrency=self.concurrency, prompt_name=prompt_name)
+                arm["scores"].extend(_numeric(res.get("scores", [])))
+                arm["feedback"].extend(res.get("feedback", []))
+                arm["errors"] += res.get("errors", 0)
+                arm["inputs_used"] = size
+
+            spent += sum(size - arms[i]["inputs_used"] for i in alive)
+            await asyncio.gather(*(extend(i) for i in alive))
+            if len(alive) <= self.keep or size >= len(inputs):
+                break
+            kept = self._survivors(alive, arms)
+            for i in alive:
+                if i not in kept:
+                    arms[i]["eliminated_at"] = rung
+            alive = kept
+            if len(alive) <= self.keep:
+                break
+
+        bounds = confidence_intervals([a["scores"] for a in arms], self.z, self.min_stdev)
+        for arm, (_, low, high) in zip(arms, bounds):
+            arm["stats"] = score_stats(arm["scores"])
+            arm["ci"] = (low, high)
+
+        def rank(arm: Dict[str, Any]) -> Tuple[bool, float]:
+            mean = arm["stats"]["mean"]
+            return (arm["eliminated_at"] is None, mean if mean is not None else -math.inf)
+
+        return {
+            "ranked": sorted(arms, key=rank, reverse=True),
+            "rungs": rungs,
+            "evaluations": spent,
+            "full_grid": len(texts) * len(inputs),
+        }
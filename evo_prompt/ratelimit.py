@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
+import random
+import time
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate_per_minute``."""
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None) -> None:
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # asyncio primitives bind to one event loop; made lazily per running loop (see _loop_lock)
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _loop_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Take ``amount`` tokens, sleeping until available. Returns seconds waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._loop_lock():
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def credit(self, amount: float) -> None:
+        """Return (or, if negative, additionally debit) tokens after the fact."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase / multiplicative decrease."""
+
+    def __init__(
+        self,
+        initial: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        cooldown: float = 1.0,
+    ) -> None:
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+        self._cond_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _condition(self) -> asyncio.Condition:
+        """Condition for the running loop, so the limiter survives repeated ``asyncio.run`` calls."""
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._cond_loop is not loop:
+            self._cond = asyncio.Condition()
+            self._cond_loop = loop
+        return self._cond
+
+    async def acquire(self) -> None:
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+    def on_success(self) -> None:
+        # roughly +increase per full window of successful requests
+        self.limit = min(self.max_limit, self.limit + self.increase / max(self.limit, 1.0))
+
+    def on_throttle(self) -> None:
+        # a burst of 429s from one window should only back off once
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """Request pacing, adaptive concurrency and retry backoff for one endpoint.
+
+    ``rpm``/``tpm`` are optional token buckets for requests and tokens per
+    minute. Concurrency adapts AIMD-style: it grows on success and halves on
+    throttling. All waiting is accounted in ``stats()``.
+    """
+
+    def __init__(
+        self,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+    ) -> None:
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AIMDLimiter(initial=max_concurrency, min_limit=min_concurrency, max_limit=max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._blocked_until = 0.0
+        self._counters: Dict[str, float] = {
+            "requests": 0,
+            "successes": 0,
+            "retries": 0,
+            "throttled": 0,
+            "server_errors": 0,
+            "transport_errors": 0,
+            "throttle_wait_seconds": 0.0,
+            "backoff_seconds": 0.0,
+        }
+
+    @asynccontextmanager
+    async def slot(self, tokens: float = 0.0) -> AsyncIterator[None]:
+        """Wait for rate budget and a concurrency slot for one request."""
+        waited = 0.0
+        pause = self._blocked_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+            waited += pause
+        if self.requests:
+            waited += await self.requests.acquire(1)
+        if self.tokens and tokens:
+            waited += await self.tokens.acquire(tokens)
+        start = time.monotonic()
+        await self.concurrency.acquire()
+        waited += time.monotonic() - start
+        self._counters["throttle_wait_seconds"] += waited
+        self._counters["requests"] += 1
+        try:
+            yield
+        finally:
+            await self.concurrency.release()
+
+    def record_tokens(self, estimated: float, actual: float) -> None:
+        if self.tokens and actual:
+            self.tokens.credit(estimated - actual)
+
+    def on_success(self) -> None:
+        self._counters["successes"] += 1
+        self.concurrency.on_success()
+
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        self._counters["throttled"] += 1
+        self.concurrency.on_throttle()
+        if retry_after:
+            # everyone sharing this limiter honours the server's pause
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    def on_error(self, transport: bool = False) -> None:
+        self._counters["transport_errors" if transport else "server_errors"] += 1
+
+    def backoff_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """Exponential backoff with full jitter, never shorter than ``retry_after``."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def backoff(self, attempt: int, retry_after: float | None = None) -> None:
+        delay = self.backoff_delay(attempt, retry_after)
+        self._counters["retries"] += 1
+        self._counters["backoff_seconds"] += delay
+        await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self._counters)
+        out["concurrency_limit"] = int(self.concurrency.limit)
+        out["in_flight"] = self.concurrency.in_flight
+        return out
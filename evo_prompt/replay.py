@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+import gzip
+import json
+
+from .clients import ModelClient
+from .cache import cache_key
+
+
+MODES = ("strict", "record", "passthrough")
+
+
+class ReplayMissError(LookupError):
+    """Raised in strict mode when no recorded response matches a request."""
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # a truncated last line from an interrupted run
+                continue
+
+
+class ReplayClient(ModelClient):
+    """Serve generations from recorded responses instead of the network.
+
+    Requests are matched in O(1) on ``(prompt, model, params)`` and, for
+    sources that did not record params (Workflow student logs), on the prompt
+    alone. Modes:
+
+    - ``"strict"``: only replay; a miss raises ``ReplayMissError``.
+    - ``"record"``: replay hits, call ``inner`` on a miss and append it to the cassette.
+    - ``"passthrough"``: always call ``inner``, recording every response.
+    """
+
+    def __init__(
+        self,
+        inner: ModelClient | None = None,
+        cassette: Path | str | None = None,
+        mode: str = "strict",
+        model: str | None = None,
+        log_dirs: Iterable[Path | str] = (),
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown replay mode: {mode}")
+        if mode != "strict" and inner is None:
+            raise ValueError(f"Replay mode '{mode}' needs an inner client")
+        self.inner = inner
+        self.mode = mode
+        self.model = model or getattr(inner, "model", "unknown")
+        self.cassette = Path(cassette) if cassette else None
+        self._exact: Dict[str, Dict[str, Any]] = {}
+        self._by_prompt: Dict[str, Dict[str, Any]] = {}
+        self._fh = None
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+        if self.cassette and self.cassette.exists():
+            self.load_cassette(self.cassette)
+        for d in log_dirs:
+            self.load_logs(d)
+
+    def _index(self, prompt: str, response: Dict[str, Any], model: str | None = None, params: dict | None = None) -> None:
+        # prompt-only matching is a fallback for sources without params; recorded calls must match fully
+        if params is not None:
+            self._exact[cache_key(prompt, model or self.model, params)] = response
+        else:
+            self._by_prompt.setdefault(cache_key(prompt, "", {}), response)
+
+    def load_cassette(self, path: Path | str) -> int:
+        """Index a cassette written by this client; returns the number of records."""
+        n = 0
+        for rec in _iter_jsonl(Path(path)):
+            if "prompt" in rec and "response" in rec:
+                self._index(rec["prompt"], rec["response"], rec.get("model"), rec.get("params") or {})
+                n += 1
+        return n
+
+    def load_logs(self, log_dir: Path | str) -> int:
+        """Index student responses from Workflow logs (``events-*.jsonl[.gz]`` and legacy ``*_student.jsonl``)."""
+        d = Path(log_dir)
+        n = 0
+        paths = sorted(d.glob("events-*.jsonl")) + sorted(d.glob("events-*.jsonl.gz")) + sorted(d.glob("*_student.jsonl"))
+        for path in paths:
+            for rec in _iter_jsonl(path):
+                if rec.get("kind", "student") != "student" or "prompt" not in rec or not isinstance(rec.get("response"), dict):
+                    continue
+                self._index(rec["prompt"], rec["response"])
+                n += 1
+        return n
+
+    def lookup(self, prompt: str, **params: Any) -> Optional[Dict[str, Any]]:
+        hit = self._exact.get(cache_key(prompt, self.model, params))
+        if hit is None:
+            hit = self._by_prompt.get(cache_key(prompt, "", {}))
+        return hit
+
+    def _record(self, prompt: str, params: dict, response: Dict[str, Any]) -> None:
+        self._index(prompt, response, self.model, params)
+        if self.cassette is None:
+            return
+        if self._fh is None:
+            self.cassette.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = self.cassette.open("a", encoding="utf-8")
+        rec = {"model": self.model, "params": params, "prompt": prompt, "response": response}
+        self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        self.recorded += 1
+
+    async def generate(self, prompt: str, **kwargs: Any) -> Dict[str, Any]:
+        if self.mode != "passthrough":
+            hit = self.lookup(prompt, **kwargs)
+            if hit is not None:
+                self.hits += 1
+                return hit
+            self.misses += 1
+            if self.mode == "strict":
+                raise ReplayMissError(f"No recorded response for {self.model} prompt ({len(prompt)} chars)")
+        response = await self.inner.generate(prompt, **kwargs)
+        self._record(prompt, kwargs, response)
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "recorded": self.recorded, "indexed": len(self._exact) + len(self._by_prompt)}
+
+    def _close_cassette(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def close(self) -> None:
+        self._close_cassette()
+        if self.inner is not None:
+            self.inner.close()
+
+    async def aclose(self) -> None:
+        self._close_cassette()
+        if self.inner is not None:
+            await self.inner.aclose()
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import json
+import math
+import sqlite3
+import threading
+import time
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    result_id TEXT,
+    created REAL NOT NULL,
+    kind TEXT NOT NULL,
+    prompt_name TEXT NOT NULL,
+    prompt_version INTEGER,
+    model TEXT,
+    teacher_model TEXT,
+    score REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER,
+    payload TEXT,
+    cached INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS results_prompt ON results(prompt_name, prompt_version);
+CREATE INDEX IF NOT EXISTS results_created ON results(created);
+CREATE INDEX IF NOT EXISTS results_model ON results(model);
+CREATE TABLE IF NOT EXISTS criteria (
+    result_pk INTEGER NOT NULL REFERENCES results(id),
+    name TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS criteria_result ON criteria(result_pk);
+"""
+
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        out = float(value)
+    except (TypeError, ValueError):
+        return None
+    return out if math.isfinite(out) else None
+
+
+def make_record(
+    prompt_name: str,
+    student_response: Dict[str, Any] | None,
+    evaluation: Dict[str, Any] | None,
+    prompt_version: int | None = None,
+    model: str | None = None,
+    teacher_model: str | None = None,
+    kind: str = "iteration",
+    result_id: str | None = None,
+    payload: Any = None,
+) -> Dict[str, Any]:
+    """Flatten one Workflow result into a results-store row."""
+    usage = (student_response or {}).get("usage") or {}
+    evaluation = evaluation or {}
+    criteria = {k: v for k, v in (evaluation.get("criteria") or {}).items() if _number(v) is not None}
+    return {
+        "result_id": result_id,
+        "created": time.time(),
+        "kind": kind,
+        "prompt_name": prompt_name,
+        "prompt_version": prompt_version,
+        "model": model,
+        "teacher_model": teacher_model,
+        "score": _number(evaluation.get("score")),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "total_tokens": usage.get("total_tokens"),
+        # served from the student cache: no tokens were spent on this row
+        "cached": bool((student_response or {}).get("cached")),
+        "criteria": {k: _number(v) for k, v in criteria.items()},
+        "payload": payload,
+    }
+
+
+class ResultsStore:
+    """SQLite-backed results table with aggregate queries.
+
+    Rows are appended by ``Workflow``; aggregates are computed inside SQLite
+    (one pass per query, grouped by version/criterion/model) rather than by
+    loading rows into Python.
+    """
+
+    def __init__(self, path: Path | str = "results/results.sqlite3") -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        if "cached" not in columns:
+            # stores created before cached rows were flagged
+            self._conn.execute("ALTER TABLE results ADD COLUMN cached INTEGER NOT NULL DEFAULT 0")
+            self._conn.commit()
+
+    def append(self, record: Dict[str, Any]) -> int:
+        return self.append_many([record])[0]
+
+    def append_many(self, records: Iterable[Dict[str, Any]]) -> List[int]:
+        ids = []
+        with self._lock, self._conn:
+            for rec in records:
+                cur = self._conn.execute(
+                    "INSERT INTO results(result_id, created, kind, prompt_name, prompt_version, model, teacher_model,"
+                    " score, prompt_tokens, completion_tokens, total_tokens, payload, cached)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        rec.get("result_id"),
+                        rec.get("created") or time.time(),
+                        rec.get("kind", "iteration"),
+                        rec["prompt_name"],
+                        rec.get("prompt_version"),
+                        rec.get("model"),
+                        rec.get("teacher_model"),
+                        rec.get("score"),
+                        rec.get("prompt_tokens"),
+                        rec.get("completion_tokens"),
+                        rec.get("total_tokens"),
+                        None if rec.get("payload") is None else json.dumps(rec["payload"], ensure_ascii=False, default=str),
+                        int(bool(rec.get("cached"))),
+                    ),
+                )
+                pk = cur.lastrowid
+                crit = [(pk, name, value) for name, value in (rec.get("criteria") or {}).items() if value is not None]
+                if crit:
+                    self._conn.executemany("INSERT INTO criteria(result_pk, name, value) VALUES (?, ?, ?)", crit)
+                ids.append(pk)
+        return ids
+
+    @staticmethod
+    def _where(prompt_name: str | None = None, version: int | None = None, model: str | None = None,
+               since: float | None = None, until: float | None = None) -> tuple[str, list]:
+        clauses, args = [], []
+        for column, op, value in (
+            ("prompt_name", "=", prompt_name),
+            ("prompt_version", "=", version),
+            ("model", "=", model),
+            ("created", ">=", since),
+            ("created", "<", until),
+        ):
+            if value is not None:
+                clauses.append(f"r.{column} {op} ?")
+                args.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def query(self, prompt_name: str | None = None, version: int | None = None, model: str | None = None,
+              since: float | None = None, until: float | None = None, limit: int | None = None,
+              batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yield matching rows (newest first) without their payload.
+
+        Rows are streamed in batches of ``batch_size`` from a separate read
+        connection (WAL readers don't block the writer), so large result sets
+        are never loaded at once and the shared connection stays free.
+        """
+        where, args = self._where(prompt_name, version, model, since, until)
+        sql = (
+            "SELECT r.id, r.result_id, r.created, r.kind, r.prompt_name, r.prompt_version, r.model, r.teacher_model,"
+            f" r.score, r.prompt_tokens, r.completion_tokens, r.total_tokens FROM results r{where} ORDER BY r.created DESC"
+        )
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        conn = sqlite3.connect(str(self.path))
+        conn.row_factory = sqlite3.Row
+        try:
+            cur = conn.execute(sql, args)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+
+    def version_stats(self, prompt_name: str, model: str | None = None, since: float | None = None) -> List[Dict[str, Any]]:
+        """Score distribution per prompt version: count, mean, stdev, min/max and percentiles."""
+        where, args = self._where(prompt_name, None, model, since)
+        pct_cols = ", ".join(
+            f"MIN(CASE WHEN rn >= {p} * n THEN score END) AS p{int(p * 100)}" for p in PERCENTILES
+        )
+        sql = (
+            "WITH ranked AS ("
+            " SELECT r.prompt_version AS version, r.score AS score, CASE WHEN r.cached = 0 THEN r.total_tokens END AS tokens,"
+            " ROW_NUMBER() OVER (PARTITION BY r.prompt_version ORDER BY r.score) AS rn,"
+            " COUNT(*) OVER (PARTITION BY r.prompt_version) AS n,"
+            " AVG(r.score) OVER (PARTITION BY r.prompt_version) AS mu"
+            f" FROM results r{where}{' AND' if where else ' WHERE'} r.score IS NOT NULL)"
+            # squared deviations from the mean; SUM(x*x) - n*mean^2 cancels badly for near-constant scores
+            " SELECT version, COUNT(*) AS count, AVG(score) AS mean, SUM((score - mu) * (score - mu)) AS ss,"
+            f" MIN(score) AS min, MAX(score) AS max, SUM(tokens) AS total_tokens, {pct_cols}"
+            " FROM ranked GROUP BY version ORDER BY version"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        out = []
+        for row in rows:
+            d = dict(row)
+            n, ss = d["count"], d.pop("ss")
+            d["stdev"] = math.sqrt(max(0.0, ss / (n - 1))) if n > 1 else 0.0
+            out.append(d)
+        return out
+
+    def criteria_breakdown(self, prompt_name: str, version: int | None = None) -> List[Dict[str, Any]]:
+        """Mean/min/max of each numeric criterion per prompt version."""
+        where, args = self._where(prompt_name, version)
+        sql = (
+            "SELECT r.prompt_version AS version, c.name AS criterion, COUNT(*) AS count, AVG(c.value) AS mean,"
+            " MIN(c.value) AS min, MAX(c.value) AS max"
+            f" FROM criteria c JOIN results r ON r.id = c.result_pk{where}"
+            " GROUP BY r.prompt_version, c.name ORDER BY r.prompt_version, c.name"
+        )
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, args).fetchall()]
+
+    def token_usage(self, prompt_name: str | None = None, since: float | None = None) -> List[Dict[str, Any]]:
+        """Request and token totals per student model; rows served from the cache add no tokens."""
+        where, args = self._where(prompt_name, None, None, since)
+        sql = (
+            "SELECT r.model AS model, COUNT(*) AS results, SUM(r.cached) AS cached_results,"
+            " SUM(CASE WHEN r.cached = 0 THEN r.prompt_tokens END) AS prompt_tokens,"
+            " SUM(CASE WHEN r.cached = 0 THEN r.completion_tokens END) AS completion_tokens,"
+            " SUM(CASE WHEN r.cached = 0 THEN r.total_tokens END) AS total_tokens"
+            f" FROM results r{where} GROUP BY r.model ORDER BY total_tokens DESC"
+        )
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, args).fetchall()]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Sequence
+import asyncio
+import time
+
+from .clients import ModelClient
+from .metrics import Metrics, percentile
+
+
+class BackendStats:
+    """Rolling latency window and error rate for one backend, with a simple circuit breaker."""
+
+    def __init__(self, name: str, window: int = 200, error_alpha: float = 0.2) -> None:
+        self.name = name
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.error_alpha = error_alpha
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+        self.cancelled = 0
+        self.open_until = 0.0
+
+    def record_success(self, seconds: float) -> None:
+        self.requests += 1
+        self.latencies.append(seconds)
+        self.error_rate *= 1 - self.error_alpha
+
+    def record_cancelled(self, seconds: float) -> None:
+        # a cancelled hedge loser took at least this long; keep it as a (censored) sample
+        # so a backend that always loses does not stay unmeasured and ranked first
+        self.cancelled += 1
+        self.latencies.append(seconds)
+
+    def record_error(self) -> None:
+        self.requests += 1
+        self.errors += 1
+        self.error_rate = self.error_rate * (1 - self.error_alpha) + self.error_alpha
+
+    def quantile(self, q: float) -> float | None:
+        return percentile(sorted(self.latencies), q)
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.open_until
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": self.error_rate,
+            "wins": self.wins,
+            "cancelled": self.cancelled,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "circuit_open": not self.healthy(time.monotonic()),
+        }
+
+
+class RoutingClient(ModelClient):
+    """Route each request to the fastest healthy backend and hedge slow ones.
+
+    ``backends`` must be interchangeable (same model family and prompt
+    format). Requests go to the healthy backend with the lowest median
+    latency (backends without samples rank after measured ones, so they are
+    reached as hedge or failover targets; cancelled attempts count with the
+    time they had run). If no answer has
+    arrived after the primary's p95 latency (``default_hedge_delay`` until
+    ``min_samples`` are seen), a duplicate is sent to the next backend; the
+    first success wins and the other call is cancelled. Hedges are capped at
+    ``hedge_budget`` of requests so tail cutting does not double the bill,
+    and never go to a backend whose circuit is open. A backend whose error rate exceeds ``error_threshold`` is skipped for
+    ``cooldown`` seconds. Failures fall over to the next backend.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[ModelClient],
+        names: Sequence[str] | None = None,
+        model: str | None = None,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        default_hedge_delay: float = 2.0,
+        min_hedge_delay: float = 0.05,
+        min_samples: int = 20,
+        hedge_budget: float = 0.1,
+        error_threshold: float = 0.5,
+        cooldown: float = 30.0,
+        window: int = 200,
+        metrics: Metrics | None = None,
+    ) -> None:
+        if not backends:
+            raise ValueError("RoutingClient needs at least one backend")
+        self.backends = list(backends)
+        names = list(names or [])
+        for i, b in enumerate(self.backends[len(names):], len(names)):
+            names.append(f"{getattr(b, 'base_url', None) or 'backend'}#{i}")
+        self.stats_by_backend = [BackendStats(n, window=window) for n in names]
+        # Workflow keys its cache on ``model``; equivalent backends share one
+        self.model = model or getattr(self.backends[0], "model", "unknown")
+        self.hedge = hedge and len(self.backends) > 1
+        self.hedge_quantile = hedge_quantile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.hedge_budget = hedge_budget
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.metrics = metrics
+        self.requests = 0
+        self.hedges = 0
+
+    def ranked(self) -> List[int]:
+        """Backend indices, best first: healthy before open circuits, measured before unmeasured, then by median latency."""
+        now = time.monotonic()
+
+        def key(i: int) -> tuple:
+            st = self.stats_by_backend[i]
+            p50 = st.quantile(0.5)
+            return (not st.healthy(now), p50 is None, p50 if p50 is not None else 0.0, st.error_rate)
+
+        return sorted(range(len(self.backends)), key=key)
+
+    def hedge_delay(self, index: int) -> float:
+        st = self.stats_by_backend[index]
+        if len(st.latencies) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, st.quantile(self.hedge_quantile) or self.default_hedge_delay)
+
+    def _may_hedge(self) -> bool:
+        return self.hedge and self.hedges < self.hedge_budget * max(1, self.requests)
+
+    def _on_error(self, index: int) -> None:
+        st = self.stats_by_backend[index]
+        st.record_error()
+        if st.requests >= 5 and st.error_rate > self.error_threshold:
+            st.open_until = time.monotonic() + self.cooldown
+        if self.metrics is not None:
+            self.metrics.inc("evo_backend_errors_total", backend=st.name)
+
+    async def _timed(self, index: int, call: Callable[[ModelClient], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            resp = await call(self.backends[index])
+        except asyncio.CancelledError:
+            self.stats_by_backend[index].record_cancelled(time.perf_counter() - start)
+            raise
+        except Exception:
+            self._on_error(index)
+            raise
+        elapsed = time.perf_counter() - start
+        self.stats_by_backend[index].record_success(elapsed)
+        if self.metrics is not None:
+            self.metrics.observe("evo_backend_seconds", elapsed, backend=self.stats_by_backend[index].name)
+        return resp
+
+    async def _route(self, call: Callable[[ModelClient], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self.requests += 1
+        order = self.ranked()
+        tasks: Dict[asyncio.Task, int] = {}
+        next_backend = 0
+        last_error: BaseException | None = None
+
+        def launch() -> None:
+            nonlocal next_backend
+            index = order[next_backend]
+            next_backend += 1
+            tasks[asyncio.ensure_future(self._timed(index, call))] = index
+
+        launch()
+        try:
+            while tasks:
+                timeout = None
+                if (
+                    next_backend < len(order)
+                    and len(tasks) == 1
+                    and self._may_hedge()
+                    and self.stats_by_backend[order[next_backend]].healthy(time.monotonic())
+                ):
+                    timeout = self.hedge_delay(next(iter(tasks.values())))
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # primary is in its slow tail: hedge on the next backend
+                    self.hedges += 1
+                    if self.metrics is not None:
+                        self.metrics.inc("evo_hedges_total", model=self.model)
+                    launch()
+                    continue
+                for task in done:
+                    index = tasks.pop(task)
+                    if task.exception() is None:
+                        self.stats_by_backend[index].wins += 1
+                        return dict(task.result(), backend=self.stats_by_backend[index].name)
+                    last_error = task.exception()
+                # fail over immediately when nothing else is in flight
+                if not tasks and next_backend < len(order):
+                    launch()
+            assert last_error is not None
+            raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def generate(self, prompt: str, **kwargs: Any) -> Dict[str, Any]:
+        return await self._route(lambda b: b.generate(prompt, **kwargs))
+
+    async def generate_many(self, prompt: str, n: int = 1, **kwargs: Any) -> Dict[str, Any]:
+        return await self._route(lambda b: b.generate_many(prompt, n=n, **kwargs))
+
+    async def stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Streams are not hedged; they go to the current best backend."""
+        index = self.ranked()[0]
+        self.requests += 1
+        async for chunk in self.backends[index].stream(prompt, **kwargs):
+            yield chunk
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "backends": {st.name: st.summary() for st in self.stats_by_backend},
+        }
+
+    def close(self) -> None:
+        for b in self.backends:
+            b.close()
+
+    async def aclose(self) -> None:
+        for b in self.backends:
+            await b.aclose()
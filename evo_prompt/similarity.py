@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Sequence, Tuple
+import hashlib
+import json
+import re
+import threading
+
+from .cache import Cache, cache_key
+from .metrics import percentile
+
+
+_EMPTY = 1 << 64
+_SPACES = re.compile(r"\s+")
+
+
+def shingles(text: str, k: int = 5) -> FrozenSet[int]:
+    """Hashed character ``k``-grams of ``text`` with whitespace collapsed.
+
+    Characters rather than words, so text without spaces (e.g. Chinese) is
+    handled the same way.
+    """
+    norm = _SPACES.sub(" ", text).strip()
+    if len(norm) <= k:
+        grams: Iterable[str] = [norm]
+    else:
+        grams = {norm[i:i + k] for i in range(len(norm) - k + 1)}
+    return frozenset(int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big") for g in grams)
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHash:
+    """One-permutation MinHash: each shingle hash goes to one of ``num_perm`` bins.
+
+    A bin keeps the smallest hash it receives; empty bins borrow from the
+    next non-empty one (rotation densification), so a signature costs one
+    pass over the shingles instead of ``num_perm``.
+    """
+
+    def __init__(self, num_perm: int = 64) -> None:
+        self.num_perm = num_perm
+
+    def signature(self, shingle_set: FrozenSet[int]) -> Tuple[int, ...]:
+        n = self.num_perm
+        bins: List[int | None] = [None] * n
+        for h in shingle_set:
+            i, v = h % n, h // n
+            cur = bins[i]
+            if cur is None or v < cur:
+                bins[i] = v
+        if all(v is None for v in bins):
+            return (_EMPTY,) * n
+        out = []
+        for i in range(n):
+            j, hops = i, 0
+            while bins[j] is None:
+                j = (j + 1) % n
+                hops += 1
+            # mix the distance in so borrowed values stay distinguishable
+            out.append(bins[j] + hops * _EMPTY if hops else bins[j])  # type: ignore[operator]
+        return tuple(out)
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures: items sharing any band are candidates.
+
+    With ``bands`` bands of ``num_perm / bands`` rows, pairs above roughly
+    ``(1 / bands) ** (bands / num_perm)`` Jaccard similarity collide with
+    high probability; candidates are then checked exactly.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 8) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.rows = num_perm // bands
+        self.bands = bands
+        self._buckets: List[Dict[Tuple[int, ...], set]] = [{} for _ in range(bands)]
+
+    def _band_keys(self, signature: Sequence[int]) -> List[Tuple[int, ...]]:
+        return [tuple(signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def add(self, item: Any, signature: Sequence[int]) -> None:
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(key, set()).add(item)
+
+    def remove(self, item: Any, signature: Sequence[int]) -> None:
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            members = buckets.get(key)
+            if members is not None:
+                members.discard(item)
+                if not members:
+                    del buckets[key]
+
+    def candidates(self, signature: Sequence[int]) -> set:
+        out: set = set()
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            out |= buckets.get(key, set())
+        return out
+
+
+def _deterministic(params: Dict[str, Any]) -> bool:
+    return not params.get("samples") and float(params.get("temperature", 0.0)) == 0.0
+
+
+class SimilarityCache(Cache):
+    """Exact cache plus an opt-in near-duplicate tier.
+
+    ``get``/``set`` behave exactly like ``inner``. Deterministic entries
+    (``temperature`` 0, not sampled) are also indexed by MinHash/LSH, and
+    ``get_similar`` returns the stored value of the most similar cached
+    prompt for the same model and params when the character-shingle Jaccard
+    similarity is at least ``threshold``. The index keeps the newest
+    ``max_entries`` prompts and is persisted next to the inner cache.
+
+    ``stats`` reports lookups, hits and the similarity of the best candidate
+    per lookup (hits and near misses) for tuning ``threshold``; the
+    similarity distributions cover the most recent ``stats_samples`` lookups.
+    """
+
+    def __init__(
+        self,
+        inner: Cache,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 8,
+        shingle_size: int = 5,
+        max_entries: int = 20000,
+        index_path: Path | str | None = None,
+        stats_samples: int = 10000,
+    ) -> None:
+        self.inner = inner
+        self.cache_dir = inner.cache_dir
+        self.ttl = inner.ttl
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.index_path = Path(index_path) if index_path is not None else Path(inner.cache_dir) / "similarity-index.jsonl"
+        self._minhash = MinHash(num_perm)
+        self._lsh = LSHIndex(num_perm, bands)
+        # exact cache key -> (group, prompt, signature)
+        self._entries: OrderedDict[str, Tuple[str, str, Tuple[int, ...]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"lookups": 0, "hits": 0, "misses": 0, "no_candidates": 0, "stale": 0}
+        self._hit_similarity: deque[float] = deque(maxlen=stats_samples)
+        self._near_miss_similarity: deque[float] = deque(maxlen=stats_samples)
+        self._load()
+
+    @staticmethod
+    def _group(model: str, params: dict) -> str:
+        return cache_key("", model, params)
+
+    def _load(self) -> None:
+        if not self.index_path.exists():
+            return
+        lines = 0
+        with self.index_path.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                lines += 1
+                try:
+                    obj = json.loads(line)
+                    self._index(obj["key"], obj["group"], obj["prompt"], tuple(obj["sig"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+        if lines > 2 * len(self._entries) + 100:
+            self._rewrite()
+
+    def _rewrite(self) -> None:
+        tmp = self.index_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as fh:
+            for key, (group, prompt, sig) in self._entries.items():
+                fh.write(json.dumps({"key": key, "group": group, "prompt": prompt, "sig": list(sig)}, ensure_ascii=False) + "\n")
+        tmp.replace(self.index_path)
+
+    def _index(self, key: str, group: str, prompt: str, sig: Tuple[int, ...]) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._lsh.remove(key, old[2])
+        self._entries[key] = (group, prompt, sig)
+        self._lsh.add(key, sig)
+        while len(self._entries) > self.max_entries:
+            victim, (_, _, vsig) = self._entries.popitem(last=False)
+            self._lsh.remove(victim, vsig)
+
+    def get(self, prompt: str, model: str, params: dict) -> Any | None:
+        return self.inner.get(prompt, model, params)
+
+    def set(self, prompt: str, model: str, params: dict, value: Any) -> None:
+        self.inner.set(prompt, model, params, value)
+        if not _deterministic(params):
+            return
+        key = cache_key(prompt, model, params)
+        group = self._group(model, params)
+        sig = self._minhash.signature(shingles(prompt, self.shingle_size))
+        with self._lock:
+            is_new = key not in self._entries
+            self._index(key, group, prompt, sig)
+            if is_new:
+                with self.index_path.open("a", encoding="utf-8") as fh:
+                    fh.write(json.dumps({"key": key, "group": group, "prompt": prompt, "sig": list(sig)}, ensure_ascii=False) + "\n")
+
+    def get_similar(self, prompt: str, model: str, params: dict, threshold: float | None = None) -> Tuple[Any, float] | None:
+        """``(value, similarity)`` of the closest cached prompt at or above ``threshold``, else None.
+
+        Only for deterministic params; callers should try ``get`` first.
+        """
+        if not _deterministic(params):
+            return None
+        threshold = self.threshold if threshold is None else threshold
+        group = self._group(model, params)
+        query = shingles(prompt, self.shingle_size)
+        sig = self._minhash.signature(query)
+        with self._lock:
+            self._counters["lookups"] += 1
+            candidates = [
+                (key, self._entries[key][1])
+                for key in self._lsh.candidates(sig)
+                if self._entries[key][0] == group and self._entries[key][1] != prompt
+            ]
+        scored = sorted(((jaccard(query, shingles(text, self.shingle_size)), key, text) for key, text in candidates), reverse=True)
+        if not scored:
+            with self._lock:
+                self._counters["no_candidates"] += 1
+                self._counters["misses"] += 1
+            return None
+        best = scored[0][0]
+        for similarity, key, text in scored:
+            if similarity < threshold:
+                break
+            value = self.inner.get(text, model, params)
+            if value is None:
+                # expired or evicted from the exact cache
+                with self._lock:
+                    self._counters["stale"] += 1
+                continue
+            with self._lock:
+                self._counters["hits"] += 1
+                self._hit_similarity.append(similarity)
+            return value, similarity
+        with self._lock:
+            self._counters["misses"] += 1
+            self._near_miss_similarity.append(best)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        def dist(values: Iterable[float]) -> Dict[str, Any]:
+            s = sorted(values)
+            return {"count": len(s), "min": s[0] if s else None, "p50": percentile(s, 0.5), "max": s[-1] if s else None}
+
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            out["hit_rate"] = out["hits"] / out["lookups"] if out["lookups"] else 0.0
+            out["threshold"] = self.threshold
+            out["indexed"] = len(self._entries)
+            out["hit_similarity"] = dist(self._hit_similarity)
+            out["near_miss_similarity"] = dist(self._near_miss_similarity)
+        inner_stats = getattr(self.inner, "stats", None)
+        if callable(inner_stats):
+            out["exact"] = inner_stats()
+        return out
+
+    def close(self) -> None:
+        self.inner.close()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, Iterable
+import asyncio
+import os
+import socket
+
+from .jobs import JobQueue
+from .workflow import Workflow
+
+
+Handler = Callable[[Workflow, JobQueue, Dict[str, Any]], Awaitable[Any]]
+
+
+def _strip_raw(evaluation: Dict[str, Any] | None) -> Dict[str, Any] | None:
+    if evaluation is None:
+        return None
+    return {k: v for k, v in evaluation.items() if k != "raw"}
+
+
+async def handle_generate(wf: Workflow, queue: JobQueue, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Student generation for ``prompt_text`` (or the head of ``prompt_name`` plus ``input``)."""
+    p = job["payload"]
+    text = p.get("prompt_text")
+    if text is None:
+        text = wf._load_head(p["prompt_name"]).get("text", "") + "\n\n" + p.get("input", "")
+    resp = await wf.generate_student(text)
+    return {"text": resp.get("text", ""), "usage": resp.get("usage", {})}
+
+
+async def handle_evaluate(wf: Workflow, queue: JobQueue, job: Dict[str, Any]) -> Dict[str, Any] | None:
+    p = job["payload"]
+    return _strip_raw(await wf.evaluator.evaluate(p["output"], instruction=p.get("instruction")))
+
+
+async def handle_score(wf: Workflow, queue: JobQueue, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate + evaluate one dataset input against the current prompt and store the row."""
+    p = job["payload"]
+    head = wf._load_head(p["prompt_name"])
+    item = await wf._run_input(p["prompt_name"], head.get("text", ""), p["input"], use_teacher=p.get("use_teacher", True))
+    wf.results_store.append(wf._record(p["prompt_name"], head.get("version"), item, kind="job"))
+    return {"id": item["id"], "prompt_version": head.get("version"), "score": (item["evaluation"] or {}).get("score")}
+
+
+async def handle_optimize(wf: Workflow, queue: JobQueue, job: Dict[str, Any]) -> Dict[str, Any]:
+    """One optimization round; on success the next round is enqueued.
+
+    The proposal is checkpointed (``round:N:pending``) before the prompt
+    store is updated, and the result (``round:N``) after. A retried round
+    (e.g. after a worker crash) reuses the proposal and, if the store
+    already holds it as a newer version, does not add it a second time.
+    """
+    p = job["payload"]
+    run_id = job["run_id"]
+    rnd = int(p.get("round", 1))
+    rounds = int(p.get("rounds", 1))
+    done = await asyncio.to_thread(queue.get_checkpoint, run_id, f"round:{rnd}")
+    if done is None:
+        pending = await asyncio.to_thread(queue.get_checkpoint, run_id, f"round:{rnd}:pending")
+        if pending is None:
+            base_version = wf._load_head(p["prompt_name"]).get("version")
+            res = await wf.run_iteration(p["prompt_name"], p["input"], use_teacher=True)
+            new_text = (res.get("proposed") or {}).get("new_prompt_text") if p.get("apply", True) else None
+            pending = {"score": (res.get("evaluation") or {}).get("score"), "new_text": new_text or None, "base_version": base_version}
+            await asyncio.to_thread(queue.set_checkpoint, run_id, f"round:{rnd}:pending", pending)
+        applied = None
+        if pending["new_text"]:
+            head = wf._load_head(p["prompt_name"])
+            if head.get("text") == pending["new_text"] and (head.get("version") or 0) > (pending["base_version"] or 0):
+                # applied before the previous attempt died
+                applied = head.get("version")
+            else:
+                head = wf.prompt_store.add_or_update_prompt(p["prompt_name"], pending["new_text"], author="worker", reason=f"{run_id}-round-{rnd}")
+                applied = head.get("version")
+        done = {"score": pending["score"], "applied_version": applied}
+        await asyncio.to_thread(queue.set_checkpoint, run_id, f"round:{rnd}", done)
+        await asyncio.to_thread(queue.set_checkpoint, run_id, "last_round", rnd)
+    if rnd < rounds:
+        await asyncio.to_thread(queue.enqueue, "optimize", dict(p, round=rnd + 1), run_id=run_id, dedupe_key=f"{run_id}:optimize:{rnd + 1}")
+    return done
+
+
+HANDLERS: Dict[str, Handler] = {
+    "generate": handle_generate,
+    "evaluate": handle_evaluate,
+    "score": handle_score,
+    "optimize": handle_optimize,
+}
+
+
+def default_owner(slot: int = 0) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{slot}"
+
+
+async def run_worker(
+    queue: JobQueue,
+    wf: Workflow,
+    concurrency: int = 1,
+    lease_seconds: float = 300.0,
+    poll_interval: float = 1.0,
+    exit_when_idle: bool = False,
+    retry_base: float = 5.0,
+    handlers: Dict[str, Handler] | None = None,
+    kinds: Iterable[str] | None = None,
+) -> Dict[str, int]:
+    """Lease and run jobs until cancelled (or, with ``exit_when_idle``, until nothing is pending).
+
+    Each of the ``concurrency`` slots holds at most one lease and renews it
+    every ``lease_seconds / 3`` while the handler runs. Failures are retried
+    with exponential backoff (``retry_base * 2**(attempt-1)``, max 5 min).
+    Queue calls run in worker threads: SQLite may wait up to its busy
+    timeout, which must not stall the other slots or the heartbeats.
+    """
+    handlers = handlers or HANDLERS
+    kinds = list(kinds or handlers)
+    counts = {"done": 0, "failed": 0, "retried": 0, "lost": 0}
+
+    async def keep_alive(job_id: int, owner: str) -> None:
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            if not await asyncio.to_thread(queue.heartbeat, job_id, owner, lease_seconds):
+                return
+
+    async def slot(index: int) -> None:
+        owner = default_owner(index)
+        while True:
+            job = await asyncio.to_thread(queue.lease, owner, lease_seconds, kinds=kinds)
+            if job is None:
+                if exit_when_idle and await asyncio.to_thread(queue.pending) == 0:
+                    return
+                await asyncio.sleep(poll_interval)
+                continue
+            beat = asyncio.create_task(keep_alive(job["id"], owner))
+            try:
+                result = await handlers[job["kind"]](wf, queue, job)
+            except Exception as e:
+                delay = min(300.0, retry_base * 2 ** (job["attempts"] - 1))
+                status = await asyncio.to_thread(queue.fail, job["id"], owner, f"{type(e).__name__}: {e}", retry_delay=delay)
+                wf.logger.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed: {e}")
+                counts["retried" if status == "queued" else "failed" if status == "failed" else "lost"] += 1
+            else:
+                counts["done" if await asyncio.to_thread(queue.complete, job["id"], owner, result) else "lost"] += 1
+            finally:
+                beat.cancel()
+
+    await asyncio.gather(*(slot(i) for i in range(max(1, concurrency))))
+    return counts
@@ -1,17 +1,47 @@
 from __future__ import annotations
 
-from .clients import ModelClient
+from .clients import ModelClient, merge_usage
 from .prompt_store import PromptStore
 from .evaluator import Evaluator
 from .optimizer import Optimizer
-from .cache import Cache
-from .logger import log_response, setup_file_logger
+from .cache import Cache, InflightRequests, cache_key
+from .logger import JsonlLogSink, setup_file_logger
+from .results_store import ResultsStore, make_record
+from .metrics import Metrics
+from collections import Counter
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Callable, Iterable
+import asyncio
+import statistics
 import uuid
 import json
 
 
+def score_stats(scores: Iterable[Any]) -> Dict[str, Any]:
+    """Aggregate numeric scores; non-numeric values are ignored."""
+    values = []
+    for s in scores:
+        try:
+            values.append(float(s))
+        except (TypeError, ValueError):
+            continue
+    if not values:
+        return {"count": 0, "mean": None, "stdev": None, "min": None, "median": None, "max": None}
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values),
+        "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "min": min(values),
+        "median": statistics.median(values),
+        "max": max(values),
+    }
+
+
+def compose_prompt(base_text: str, input_context: str) -> str:
+    """The student prompt: stored prompt text followed by the input."""
+    return base_text + "\n\n" + input_context
+
+
 class Workflow:
     def __init__(
         self,
@@ -23,6 +53,12 @@ class Workflow:
         cache: Cache | None = None,
         logs_dir: str | Path = "logs",
         results_dir: str | Path = "results",
+        inflight: InflightRequests | None = None,
+        log_sink: JsonlLogSink | None = None,
+        results_store: ResultsStore | None = None,
+        write_result_files: bool = True,
+        metrics: Metrics | None = None,
+        allow_similar: bool = False,
     ) -> None:
         self.student = student_client
         self.teacher = teacher_client
@@ -30,40 +66,153 @@ class Workflow:
         self.evaluator = evaluator
         self.optimizer = optimizer
         self.cache = cache or Cache()
+        self.inflight = inflight or InflightRequests()
         self.logs_dir = Path(logs_dir)
         self.results_dir = Path(results_dir)
         self.logs_dir.mkdir(parents=True, exist_ok=True)
         self.results_dir.mkdir(parents=True, exist_ok=True)
         self.logger = setup_file_logger(self.logs_dir)
+        # student/evaluation records go to rotated JSONL segments off the event loop
+        self.log_sink = log_sink or JsonlLogSink(self.logs_dir)
+        # every scored result is also indexed for querying (see ResultsStore)
+        self.results_store = results_store or ResultsStore(self.results_dir / "results.sqlite3")
+        self.write_result_files = write_result_files
+        self.metrics = metrics or Metrics()
+        # default for generate_student: accept a near-duplicate prompt's cached output
+        self.allow_similar = allow_similar
+        if getattr(self.evaluator, "metrics", None) is None:
+            self.evaluator.metrics = self.metrics
 
-    async def run_iteration(self, prompt_name: str, input_context: str, use_teacher: bool = True) -> Dict[str, Any]:
-        prompt_obj = self.prompt_store.get_prompt(prompt_name)
-        if not prompt_obj:
+    def close(self) -> None:
+        """Flush and close the log sink, results store and evaluation cache."""
+        self.log_sink.close()
+        self.results_store.close()
+        if hasattr(self.evaluator, "close"):
+            self.evaluator.close()
+
+    def _load_head(self, prompt_name: str) -> Dict[str, Any]:
+        head = self.prompt_store.get_head(prompt_name)
+        if head is None:
             raise ValueError(f"Prompt not found: {prompt_name}")
+        return head
 
-        prompt_text = prompt_obj.get("text", "") + "\n\n" + input_context
+    def _record(self, prompt_name: str, version: int | None, item: Dict[str, Any], kind: str) -> Dict[str, Any]:
+        return make_record(
+            prompt_name,
+            item.get("student_response"),
+            item.get("evaluation"),
+            prompt_version=version,
+            model=getattr(self.student, "model", None),
+            teacher_model=getattr(self.teacher, "model", None),
+            kind=kind,
+            result_id=item.get("id"),
+        )
 
+    async def generate_student(self, prompt_text: str, allow_similar: bool | None = None) -> Dict[str, Any]:
+        """Deterministic student completion, cached on the exact prompt.
+
+        With ``allow_similar`` (default ``self.allow_similar``) and a
+        ``SimilarityCache``, an exact miss may be served from the most similar
+        cached prompt; the response then carries ``similarity``. Responses
+        served from the cache are marked ``cached`` (their usage was already paid).
+        """
         params = {"temperature": 0.0}
-        cached = self.cache.get(prompt_text, getattr(self.student, "model", "unknown"), params)
+        model = getattr(self.student, "model", "unknown")
+        with self.metrics.span("cache_lookup", role="student") as span:
+            cached = self.cache.get(prompt_text, model, params)
+            span["status"] = "hit" if cached else "miss"
         if cached:
-            student_resp = cached
+            self.metrics.inc("evo_cache_hits_total", role="student")
             self.logger.info("Cache hit for student generation")
-        else:
-            student_resp = await self.student.generate(prompt_text, **params)
-            self.cache.set(prompt_text, getattr(self.student, "model", "unknown"), params, student_resp)
+            return dict(cached, cached=True)
+        if (self.allow_similar if allow_similar is None else allow_similar) and hasattr(self.cache, "get_similar"):
+            similar = self.cache.get_similar(prompt_text, model, params)
+            if similar is not None:
+                self.metrics.inc("evo_cache_hits_total", role="student", tier="similar")
+                self.metrics.observe("evo_cache_similarity", similar[1], role="student")
+                self.logger.info(f"Near-duplicate cache hit for student generation (similarity {similar[1]:.3f})")
+                return dict(similar[0], similarity=similar[1], cached=True)
+        self.metrics.inc("evo_cache_misses_total", role="student")
+
+        async def call() -> Dict[str, Any]:
+            with self.metrics.span("student_generate", model=model):
+                student_resp = await self.student.generate(prompt_text, **params)
+            self.metrics.record_usage(model, student_resp.get("usage"), role="student")
+            self.cache.set(prompt_text, model, params, student_resp)
+            return student_resp
+
+        # identical concurrent requests share one call
+        return await self.inflight.run(cache_key(prompt_text, model, params), call)
+
+    async def sample_student(self, prompt_text: str, n: int, temperature: float = 0.7) -> Dict[str, Any]:
+        """``n`` sampled student completions, cached as a growing list of choices.
+
+        A later request for more samples only asks the model for the missing
+        ones (in one ``generate_many`` call); fewer are served from the cache.
+        """
+        params = {"temperature": temperature, "samples": True}
+        model = getattr(self.student, "model", "unknown")
+        cached = self.cache.get(prompt_text, model, params) or {"choices": [], "usage": {}}
+        choices = list(cached.get("choices", []))
+        if len(choices) >= n:
+            self.metrics.inc("evo_cache_hits_total", role="student")
+            return {"text": choices[0]["text"], "choices": choices[:n], "raw": {"cached": True}, "usage": {}}
+        self.metrics.inc("evo_cache_misses_total", role="student")
+
+        with self.metrics.span("student_generate", model=model):
+            resp = await self.student.generate_many(prompt_text, n=n - len(choices), temperature=temperature)
+        self.metrics.record_usage(model, resp.get("usage"), role="student")
+        for c in resp.get("choices", []):
+            choices.append(dict(c, index=len(choices)))
+        self.cache.set(prompt_text, model, params, {"choices": choices, "usage": merge_usage([cached.get("usage", {}), resp.get("usage", {})])})
+        return {"text": choices[0]["text"], "choices": choices[:n], "raw": resp.get("raw", {}), "usage": resp.get("usage", {})}
+
+    async def self_consistency(self, prompt_text: str, n: int = 5, temperature: float = 0.7) -> Dict[str, Any]:
+        """Majority answer over ``n`` samples (whitespace/case-insensitive) and its agreement ratio."""
+        resp = await self.sample_student(prompt_text, n, temperature=temperature)
+        texts = [c["text"] for c in resp["choices"]]
+        votes = Counter(" ".join(t.split()).lower() for t in texts)
+        winner, count = votes.most_common(1)[0] if votes else ("", 0)
+        text = next((t for t in texts if " ".join(t.split()).lower() == winner), "")
+        return {"text": text, "agreement": count / len(texts) if texts else 0.0, "choices": resp["choices"]}
+
+    async def _run_input(self, prompt_name: str, base_text: str, input_context: str, use_teacher: bool) -> Dict[str, Any]:
+        """Student generation plus (optional) teacher evaluation for one input."""
+        prompt_text = compose_prompt(base_text, input_context)
+        student_resp = await self.generate_student(prompt_text)
 
         # log student response
-        resp_id = uuid.uuid4().hex
-        log_response(self.logs_dir, f"{resp_id}_student.jsonl", {"prompt_name": prompt_name, "prompt": prompt_text, "response": student_resp})
+        resp_id = self._log_student(prompt_name, prompt_text, student_resp)
 
         # evaluate
         eval_result = None
         if use_teacher:
+            eval_result = await self.evaluate_output(prompt_name, resp_id, prompt_text, student_resp)
+
+        return {"id": resp_id, "prompt_text": prompt_text, "student_response": student_resp, "evaluation": eval_result}
+
+    def _log_student(self, prompt_name: str, prompt_text: str, student_resp: Dict[str, Any]) -> str:
+        resp_id = uuid.uuid4().hex
+        self.log_sink.write({"id": resp_id, "kind": "student", "prompt_name": prompt_name, "prompt": prompt_text, "response": student_resp})
+        return resp_id
+
+    async def evaluate_output(self, prompt_name: str, resp_id: str, prompt_text: str, student_resp: Dict[str, Any]) -> Dict[str, Any]:
+        """Teacher evaluation of one student response, logged under ``resp_id``."""
+        with self.metrics.span("teacher_evaluate"):
             eval_result = await self.evaluator.evaluate(student_resp.get("text", ""), instruction=prompt_text)
-            log_response(self.logs_dir, f"{resp_id}_evaluation.jsonl", {"eval": eval_result})
+        self.log_sink.write({"id": resp_id, "kind": "evaluation", "prompt_name": prompt_name, "eval": eval_result})
+        return eval_result
+
+    async def run_iteration(self, prompt_name: str, input_context: str, use_teacher: bool = True) -> Dict[str, Any]:
+        with self.metrics.span("prompt_load"):
+            head = self._load_head(prompt_name)
+        item = await self._run_input(prompt_name, head.get("text", ""), input_context, use_teacher)
+        student_resp = item["student_response"]
+        eval_result = item["evaluation"]
 
         # propose improvement
-        proposed = await self.optimizer.propose_improvement(prompt_name, student_resp.get("text", ""), eval_result or {})
+        with self.metrics.span("optimize"):
+            proposed = await self.optimizer.propose_improvement(prompt_name, student_resp.get("text", ""), eval_result or {})
 
         out = {
             "prompt_name": prompt_name,
@@ -73,9 +222,125 @@ class Workflow:
         }
 
         # save results
-        out_path = self.results_dir / f"{resp_id}_result.json"
-        out_path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
-
+        self._persist_iteration(prompt_name, head.get("version"), item, out)
         return out
 
+    def _persist_iteration(self, prompt_name: str, version: int | None, item: Dict[str, Any], out: Dict[str, Any]) -> None:
+        with self.metrics.span("persist"):
+            self.results_store.append(self._record(prompt_name, version, item, kind="iteration"))
+            if self.write_result_files:
+                out_path = self.results_dir / f"{item['id']}_result.json"
+                out_path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    async def _iter_inputs(
+        self,
+        prompt_name: str,
+        base_text: str,
+        inputs: Iterable[str],
+        concurrency: int,
+        use_teacher: bool,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+
+        async def run_one(index: int, input_context: str) -> Dict[str, Any]:
+            item = {"index": index, "input": input_context, "error": None}
+            try:
+                item.update(await self._run_input(prompt_name, base_text, input_context, use_teacher))
+            except Exception as exc:
+                self.logger.warning(f"Batch item {index} failed: {exc!r}")
+                item.update({"student_response": None, "evaluation": None, "error": repr(exc)})
+            return item
+
+        pending: set[asyncio.Task] = set()
+        try:
+            for index, input_context in enumerate(inputs):
+                pending.add(asyncio.ensure_future(run_one(index, input_context)))
+                if len(pending) < concurrency:
+                    continue
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def iter_batch(
+        self,
+        prompt_name: str,
+        inputs: Iterable[str],
+        concurrency: int = 4,
+        use_teacher: bool = True,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield per-input results in completion order.
+
+        ``inputs`` is consumed lazily, so at most ``concurrency`` inputs are in
+        flight at any time. Failures are reported on the item (``error``)
+        instead of aborting the batch.
+        """
+        head = self._load_head(prompt_name)
+        async for item in self._iter_inputs(prompt_name, head.get("text", ""), inputs, concurrency, use_teacher):
+            item["prompt_version"] = head.get("version")
+            yield item
+
+    async def score_text(self, prompt_text: str, inputs: Iterable[str], concurrency: int = 4, prompt_name: str = "") -> Dict[str, Any]:
+        """Score an arbitrary (not necessarily stored) prompt text against ``inputs``."""
+        items = []
+        async for item in self._iter_inputs(prompt_name, prompt_text, inputs, concurrency, use_teacher=True):
+            items.append(item)
+        items.sort(key=lambda it: it["index"])
+        evaluations = [it["evaluation"] or {} for it in items if not it["error"]]
+        return {
+            "text": prompt_text,
+            "stats": score_stats(e.get("score") for e in evaluations),
+            "scores": [e.get("score") for e in evaluations],
+            "feedback": [e.get("feedback") for e in evaluations if e.get("feedback")],
+            "errors": sum(1 for it in items if it["error"]),
+        }
+
+    async def run_batch(
+        self,
+        prompt_name: str,
+        inputs: Iterable[str],
+        concurrency: int = 4,
+        use_teacher: bool = True,
+        on_result: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> Dict[str, Any]:
+        """Score one prompt against many inputs with bounded concurrency.
+
+        ``on_result`` is called with each item as soon as it completes. The
+        aggregate is written to a single ``<batch_id>_batch.json``.
+        """
+        items = []
+        pending_rows = []
+        async for item in self.iter_batch(prompt_name, inputs, concurrency=concurrency, use_teacher=use_teacher):
+            items.append(item)
+            if not item["error"]:
+                pending_rows.append(self._record(prompt_name, item["prompt_version"], item, kind="batch"))
+            if len(pending_rows) >= 100:
+                with self.metrics.span("persist"):
+                    self.results_store.append_many(pending_rows)
+                pending_rows = []
+            if on_result:
+                on_result(item)
+        with self.metrics.span("persist"):
+            self.results_store.append_many(pending_rows)
+        items.sort(key=lambda it: it["index"])
+
+        scores = [(it.get("evaluation") or {}).get("score") for it in items if not it["error"]]
+        out = {
+            "batch_id": uuid.uuid4().hex,
+            "prompt_name": prompt_name,
+            "total": len(items),
+            "errors": sum(1 for it in items if it["error"]),
+            "stats": score_stats(scores),
+            "items": items,
+        }
 
+        out_path = self.results_dir / f"{out['batch_id']}_batch.json"
+        out_path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+        return out
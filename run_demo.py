@@ -35,6 +35,10 @@ async def demo_loop(cfg: Config, prompt_name: str, input_text: str, rounds: int
         elif apply_update.strip().lower() == "stop":
             break
 
+    wf.close()
+    await student.aclose()
+    await teacher.aclose()
+
 
 def main():
     cfg = interactive_config_prompt()
@@ -12,11 +12,15 @@ from evo_prompt.evaluator import Evaluator
 from evo_prompt.optimizer import Optimizer
 from evo_prompt.cache import Cache
 from evo_prompt.workflow import Workflow
+from evo_prompt.population import PopulationOptimizer
+from evo_prompt.pipeline import PipelinedRounds
+from evo_prompt.chunking import MapReduce
 import pathlib
 import os
 
 
-async def run_full_demo(api_key: str, base_url: str, prompt_name: str = "sample", input_path: str = "data/input.txt", rounds: int = 3):
+async def run_full_demo(api_key: str, base_url: str, prompt_name: str = "sample", input_path: str = "data/input.txt", rounds: int = 3, population: int = 0,
+                        chunk_tokens: int = 0):
     # allow overriding model via env var DEEPSEEK_MODEL, default to deepseek-chat
     import os
 
@@ -38,30 +42,53 @@ async def run_full_demo(api_key: str, base_url: str, prompt_name: str = "sample"
     cache = Cache()
     wf = Workflow(student, teacher, store, evaluator, optimizer, cache)
 
-    # read input
-    p = pathlib.Path(input_path)
-    if not p.exists():
-        raise FileNotFoundError(f"Input file not found: {input_path}")
-    input_text = p.read_text(encoding="utf-8")
-
-    for i in range(rounds):
-        print(f"\n--- ROUND {i+1} ---")
-        res = await wf.run_iteration(prompt_name, input_text, use_teacher=True)
-        score = res.get("evaluation", {}).get("score")
-        print(f"Evaluation score: {score}")
-        proposed = res.get("proposed", {})
-        summary = proposed.get("change_summary")
-        new_text = proposed.get("new_prompt_text")
-        print("Proposed change:", summary)
-        if new_text:
-            # apply update automatically
-            store.add_or_update_prompt(prompt_name, new_text, author="auto_optimizer", reason=f"auto-round-{i+1}")
-            print("Applied new prompt version.")
-
-    # close clients
-    student.close()
-    teacher.close()
+    try:
+        # read input
+        p = pathlib.Path(input_path)
+        if not p.exists():
+            raise FileNotFoundError(f"Input file not found: {input_path}")
 
+        if chunk_tokens and p.stat().st_size > chunk_tokens * 4:
+            # long document: never loaded whole; each round maps the prompt over chunks and reduces
+            mr = MapReduce(wf, chunk_tokens=chunk_tokens, overlap_tokens=chunk_tokens // 10)
+            for i in range(rounds):
+                print(f"\n--- ROUND {i+1} (chunked) ---")
+                res = await mr.run(prompt_name, p)
+                print(f"Chunks: {len(res['chunks'])}, evaluation score: {(res.get('evaluation') or {}).get('score')}")
+                proposed = res.get("proposed", {})
+                print("Proposed change:", proposed.get("change_summary"))
+                if proposed.get("new_prompt_text"):
+                    store.add_or_update_prompt(prompt_name, proposed["new_prompt_text"], author="auto_optimizer", reason=f"auto-round-{i+1}")
+                    print("Applied new prompt version.")
+            return
+
+        input_text = p.read_text(encoding="utf-8")
+
+        if population > 1:
+            # evolutionary mode: each round scores a whole population concurrently
+            evo = PopulationOptimizer(wf, population_size=population)
+            res = await evo.evolve(prompt_name, [input_text], generations=rounds)
+            for gen in res["generations"]:
+                print(f"\n--- GENERATION {gen['generation']} --- best score: {gen['best_score']}")
+            print("Best prompt:", res["best"]["text"])
+            print("Applied new prompt version." if res["applied"] else "Kept current prompt.")
+            return
+
+        def report(res: dict) -> None:
+            print(f"\n--- ROUND {res['round']} ---")
+            print(f"Evaluation score: {(res.get('evaluation') or {}).get('score')}")
+            print("Proposed change:", res.get("proposed", {}).get("change_summary"))
+            if res["applied"]:
+                print("Applied new prompt version.")
+
+        # rounds are pipelined: the next student call overlaps with evaluation and bookkeeping,
+        # and proposals are applied automatically
+        await PipelinedRounds(wf).run(prompt_name, input_text, rounds=rounds, apply=True, on_round=report)
+    finally:
+        # flush logs and release pooled connections, also when a round fails
+        wf.close()
+        await student.aclose()
+        await teacher.aclose()
 
 if __name__ == "__main__":
     # parameters — replace API_KEY and BASE_URL as needed
@@ -78,6 +105,11 @@ if __name__ == "__main__":
     if not pathlib.Path(input_file).exists():
         pathlib.Path(input_file).write_text("这是用于演示的示例文章内容。\n请根据 sample 提示词生成摘要。", encoding="utf-8")
 
-    asyncio.run(run_full_demo(API_KEY, BASE_URL, prompt_name="sample", input_path=input_file, rounds=3))
+    # EVO_POPULATION > 1 switches to the population-based optimizer
+    population = int(os.environ.get("EVO_POPULATION") or 0)
+    # EVO_CHUNK_TOKENS > 0 processes inputs larger than that many tokens chunk by chunk
+    chunk_tokens = int(os.environ.get("EVO_CHUNK_TOKENS") or 0)
+    asyncio.run(run_full_demo(API_KEY, BASE_URL, prompt_name="sample", input_path=input_file, rounds=3, population=population,
+                              chunk_tokens=chunk_tokens))
 
 